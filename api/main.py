@@ -1,9 +1,11 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
 import sys
+import asyncio
 from dotenv import load_dotenv
 import time
 
@@ -15,15 +17,20 @@ load_dotenv(dotenv_path)
 # 프로젝트 루트를 Python 경로에 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import chromadb
+from chromadb.config import Settings
+import numpy as np
 from langchain.schema import Document
-import json
+import orjson
+
+from rag.encoder import get_encoder
+from rag.query_rag import mmr_select
 
 app = FastAPI(
     title="청년정책 검색 API",
     description="서울시 청년정책 검색 및 AI 답변 생성 API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse  # C 확장 직렬화로 응답 인코딩 가속
 )
 
 # CORS 설정
@@ -36,9 +43,13 @@ app.add_middleware(
 )
 
 # 전역 변수
-vectorstore = None
+collection = None  # 네이티브 chromadb 컬렉션
 embedding_model = None
 openai_client = None
+openai_http_client = None  # OpenAI용 커넥션 풀 (종료 시 정리)
+policy_index = {}  # policy_id -> 정책 상세 dict (시작 시 한 번 로드)
+
+DATA_DIR = os.path.join(BASE_DIR, "data", "processed")
 
 CATEGORIES = {
     "전체": "",  # 전체 정책 코드(필요시)
@@ -73,26 +84,56 @@ class AnswerResponse(BaseModel):
     sources: List[Dict[str, Any]]
     confidence: float
 
+def load_policy_index():
+    """정책 JSON 파일들을 메모리에 한 번만 로드 (요청마다 디스크 읽기/파싱 제거)"""
+    global policy_index
+
+    if not os.path.exists(DATA_DIR):
+        print(f"⚠️ 정책 데이터 디렉토리가 없습니다: {DATA_DIR}")
+        return
+
+    for filename in os.listdir(DATA_DIR):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(DATA_DIR, filename), 'rb') as f:
+                policy_index[filename[:-len(".json")]] = orjson.loads(f.read())
+        except Exception as e:
+            print(f"❌ 정책 파일 로드 실패: {filename} - {e}")
+
+    print(f"✅ 정책 상세 인덱스 로드 완료: {len(policy_index)}건")
+
 def load_vectorstore():
     """벡터스토어 로드"""
-    global vectorstore, embedding_model, openai_client
-    
+    global collection, embedding_model, openai_client, openai_http_client
+
     try:
-        # 임베딩 모델 로드
-        embedding_model = HuggingFaceEmbeddings(model_name="BM-K/KoSimCSE-roberta")
-        
-        # 벡터스토어 로드
-        vectorstore = Chroma(
-            persist_directory=os.path.join(os.path.dirname(os.path.dirname(__file__)), "rag", "vectorstore"),
-            embedding_function=embedding_model
+        # 임베딩 모델 로드 (프로세스 공유 캐시 팩토리 사용)
+        embedding_model = get_encoder("BM-K/KoSimCSE-roberta")
+
+        # 벡터스토어 로드: langchain 래퍼 대신 네이티브 chromadb 클라이언트 사용
+        # (쿼리를 직접 임베딩해서 넘기므로 래퍼의 per-call 디스패치 오버헤드 제거)
+        chroma_client = chromadb.PersistentClient(
+            path=os.path.join(os.path.dirname(os.path.dirname(__file__)), "rag", "vectorstore"),
+            settings=Settings(anonymized_telemetry=False)
         )
-        
+        # langchain Chroma.from_documents가 만드는 기본 컬렉션 이름은 "langchain"
+        collection = chroma_client.get_collection("langchain")
+
         # OpenAI 클라이언트 초기화
         openai_api_key = os.getenv('OPENAI_API_KEY')
         if openai_api_key:
             try:
-                from openai import OpenAI
-                openai_client = OpenAI(api_key=openai_api_key)
+                import httpx
+                from openai import AsyncOpenAI
+                # 비동기 클라이언트 사용: LLM 응답 대기 중에도 이벤트 루프가 다른 요청을 처리
+                # HTTP/2 + keep-alive 커넥션 풀로 요청마다 TLS 핸드셰이크를 새로 하지 않음
+                openai_http_client = httpx.AsyncClient(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                    timeout=30.0
+                )
+                openai_client = AsyncOpenAI(api_key=openai_api_key, http_client=openai_http_client)
                 print("✅ OpenAI 클라이언트 초기화 완료")
             except ImportError:
                 print("❌ openai 패키지가 설치되어 있지 않습니다. OpenAI 기능이 비활성화됩니다.")
@@ -105,34 +146,80 @@ def load_vectorstore():
         print(f"❌ 벡터스토어 로드 실패: {e}")
         return False
 
-def generate_llm_answer(query: str, context_docs: List[Document]) -> str:
+def query_collection(query: str, k: int) -> List[tuple]:
+    """네이티브 chromadb 컬렉션 질의. (Document, 거리) 리스트 반환"""
+    query_embedding = embedding_model.encode([query], normalize_embeddings=True)
+    results = collection.query(
+        query_embeddings=query_embedding.tolist(),
+        n_results=k,
+        include=["metadatas", "documents", "distances"]
+    )
+
+    docs_with_scores = []
+    if results["ids"] and results["ids"][0]:
+        for metadata, document, distance in zip(
+            results["metadatas"][0],
+            results["documents"][0],
+            results["distances"][0]
+        ):
+            docs_with_scores.append(
+                (Document(page_content=document, metadata=metadata), float(distance))
+            )
+    return docs_with_scores
+
+def query_collection_mmr(query: str, k: int, fetch_k: int) -> List[Document]:
+    """후보 fetch_k개를 가져와 MMR로 중복 적은 top-k 문서 선택"""
+    query_embedding = embedding_model.encode([query], normalize_embeddings=True)
+    results = collection.query(
+        query_embeddings=query_embedding.tolist(),
+        n_results=fetch_k,
+        include=["embeddings", "metadatas", "documents"]
+    )
+
+    docs = []
+    if results["ids"] and results["ids"][0]:
+        cand_embs = np.asarray(results["embeddings"][0], dtype=np.float32)
+        order = mmr_select(np.asarray(query_embedding[0], dtype=np.float32), cand_embs, k)
+        for idx in order:
+            docs.append(Document(
+                page_content=results["documents"][0][idx],
+                metadata=results["metadatas"][0][idx]
+            ))
+    return docs
+
+def build_llm_context(context_docs: List[Document]) -> str:
+    """검색된 정책 문서들을 LLM 프롬프트용 컨텍스트로 변환"""
+    # 메서드 조회를 지역 변수로 바인딩해 문서당 반복 dict 조회 비용 절감
+    return "\n".join(
+        f"""
+정책 {i}: {m('title', '제목 없음')}
+주관기관: {m('agency', '')}
+연령: {m('age_range', '')}
+신청기간: {m('apply_start', '')} ~ {m('apply_end', '')}
+지원내용: {doc.page_content[:300]}...
+신청사이트: {m('application_site', '')}
+"""
+        for i, doc in enumerate(context_docs, 1)
+        for m in (doc.metadata.get,)
+    )
+
+async def generate_llm_answer(query: str, context_docs: List[Document]) -> str:
     """
     LLM을 사용하여 답변 생성
     OpenAI API 또는 템플릿 기반 답변 생성
     """
     if not context_docs:
         return "죄송합니다. 관련 정책을 찾을 수 없습니다."
-    
+
     # OpenAI 클라이언트가 있으면 사용
     if openai_client:
         try:
             # 컨텍스트 생성
-            context_parts = []
-            for i, doc in enumerate(context_docs, 1):
-                context_parts.append(f"""
-정책 {i}: {doc.metadata.get('title', '제목 없음')}
-주관기관: {doc.metadata.get('agency', '')}
-연령: {doc.metadata.get('age_range', '')}
-신청기간: {doc.metadata.get('apply_start', '')} ~ {doc.metadata.get('apply_end', '')}
-지원내용: {doc.page_content[:300]}...
-신청사이트: {doc.metadata.get('application_site', '')}
-""")
-            
-            context = "\n".join(context_parts)
-            
+            context = build_llm_context(context_docs)
+
             # OpenAI API 호출 (GPT-4o-mini 사용)
             model_name = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
-            response = openai_client.chat.completions.create(
+            response = await openai_client.chat.completions.create(
                 model=model_name,
                 messages=[
                     {"role": "system", "content": "당신은 서울시 청년 정책 전문 상담사입니다. 사용자의 질문에 친절하고 정확하게 답변해주세요."},
@@ -187,6 +274,13 @@ async def startup_event():
     """서버 시작 시 벡터스토어 로드"""
     if not load_vectorstore():
         raise Exception("벡터스토어 로드 실패")
+    load_policy_index()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """서버 종료 시 커넥션 풀 정리"""
+    if openai_http_client:
+        await openai_http_client.aclose()
 
 @app.get("/")
 async def root():
@@ -206,7 +300,7 @@ async def health_check():
     """헬스 체크"""
     return {
         "status": "healthy",
-        "vectorstore_loaded": vectorstore is not None
+        "vectorstore_loaded": collection is not None
     }
 
 @app.post("/search", response_model=SearchResponse)
@@ -220,14 +314,17 @@ async def search_policies(request: SearchRequest):
     Returns:
         검색 결과
     """
-    if not vectorstore:
+    if collection is None:
         raise HTTPException(status_code=500, detail="벡터스토어가 로드되지 않았습니다")
-    
+
     try:
-        # 검색 실행
-        results = vectorstore.similarity_search(
-            request.query, 
-            k=request.k
+        # 검색 실행 (CPU 바운드 임베딩+HNSW가 이벤트 루프를 막지 않도록 스레드로 오프로드)
+        # MMR 재랭킹으로 비슷한 정책끼리 중복되는 결과를 줄임
+        results = await asyncio.to_thread(
+            query_collection_mmr,
+            request.query,
+            request.k,
+            request.k * 4
         )
         
         # 결과 포맷팅
@@ -270,31 +367,54 @@ async def generate_answer(request: AnswerRequest):
     Returns:
         AI 답변과 소스 정보
     """
-    if not vectorstore:
+    if collection is None:
         raise HTTPException(status_code=500, detail="벡터스토어가 로드되지 않았습니다")
-    
+
     try:
-        # 관련 정책 검색
-        context_docs = vectorstore.similarity_search(
-            request.query, 
-            k=request.k
-        )
-        
+        # 관련 정책 검색 (점수 포함 버전으로 한 번만 검색, 블로킹 검색은 스레드로 오프로드)
+        if request.user_context:
+            # 원 쿼리와 사용자 컨텍스트 보강 쿼리를 병렬로 검색해 recall을 높임
+            results_raw, results_ctx = await asyncio.gather(
+                asyncio.to_thread(query_collection, request.query, request.k),
+                asyncio.to_thread(
+                    query_collection,
+                    f"{request.query} {request.user_context}",
+                    request.k
+                )
+            )
+
+            # 거리 오름차순으로 병합 후 정책 ID 기준 중복 제거
+            docs_with_scores = []
+            seen = set()
+            for doc, distance in sorted(results_raw + results_ctx, key=lambda x: x[1]):
+                key = doc.metadata.get("policy_id") or doc.metadata.get("title", "")
+                if key in seen:
+                    continue
+                seen.add(key)
+                docs_with_scores.append((doc, distance))
+            docs_with_scores = docs_with_scores[:request.k]
+        else:
+            docs_with_scores = await asyncio.to_thread(
+                query_collection, request.query, request.k
+            )
+        context_docs = [doc for doc, _ in docs_with_scores]
+
         # LLM 답변 생성
-        answer = generate_llm_answer(request.query, context_docs)
-        
-        # 소스 정보 정리
-        sources = []
-        for doc in context_docs:
-            source = {
-                "title": doc.metadata.get("title", ""),
-                "policy_id": doc.metadata.get("policy_id", ""),
-                "agency": doc.metadata.get("agency", ""),
-                "page_url": doc.metadata.get("page_url", ""),
-                "application_site": doc.metadata.get("application_site", ""),
-                "relevance_score": 0.95  # 실제로는 유사도 점수 계산 필요
+        answer = await generate_llm_answer(request.query, context_docs)
+
+        # 소스 정보 정리 (metadata.get을 지역 바인딩해 반복 조회 비용 절감)
+        sources = [
+            {
+                "title": m("title", ""),
+                "policy_id": m("policy_id", ""),
+                "agency": m("agency", ""),
+                "page_url": m("page_url", ""),
+                "application_site": m("application_site", ""),
+                "relevance_score": float(1 - distance)  # 거리를 유사도로 변환
             }
-            sources.append(source)
+            for doc, distance in docs_with_scores
+            for m in (doc.metadata.get,)
+        ]
         
         return AnswerResponse(
             query=request.query,
@@ -306,6 +426,70 @@ async def generate_answer(request: AnswerRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"답변 생성 중 오류 발생: {str(e)}")
 
+@app.post("/answer/stream")
+async def generate_answer_stream(request: AnswerRequest):
+    """
+    LLM 답변 스트리밍 API (SSE)
+
+    토큰이 생성되는 대로 전송해 첫 응답까지의 체감 지연을 줄입니다.
+    답변 텍스트는 {"delta": ...} 이벤트로, 소스 정보는 마지막에
+    {"sources": [...]} 이벤트로 전송하고 [DONE]으로 종료합니다.
+    """
+    if collection is None:
+        raise HTTPException(status_code=500, detail="벡터스토어가 로드되지 않았습니다")
+
+    # 관련 정책 검색 (점수 포함, 스레드로 오프로드)
+    docs_with_scores = await asyncio.to_thread(
+        query_collection, request.query, request.k
+    )
+    context_docs = [doc for doc, _ in docs_with_scores]
+
+    async def event_stream():
+        if openai_client and context_docs:
+            try:
+                context = build_llm_context(context_docs)
+                model_name = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+                stream = await openai_client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": "당신은 서울시 청년 정책 전문 상담사입니다. 사용자의 질문에 친절하고 정확하게 답변해주세요."},
+                        {"role": "user", "content": f"질문: {request.query}\n\n관련 정책 정보:\n{context}\n\n위 정보를 바탕으로 답변해주세요."}
+                    ],
+                    max_tokens=1000,
+                    temperature=0.7,
+                    stream=True
+                )
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield f"data: {orjson.dumps({'delta': delta}).decode()}\n\n"
+            except Exception as e:
+                print(f"OpenAI 스트리밍 실패: {e}")
+                # 실패 시 템플릿 기반 답변을 한 번에 전송
+                answer = await generate_llm_answer(request.query, context_docs)
+                yield f"data: {orjson.dumps({'delta': answer}).decode()}\n\n"
+        else:
+            # OpenAI 없으면 템플릿 기반 답변을 한 번에 전송
+            answer = await generate_llm_answer(request.query, context_docs)
+            yield f"data: {orjson.dumps({'delta': answer}).decode()}\n\n"
+
+        # 소스 정보는 마지막 이벤트로 전송
+        sources = [
+            {
+                "title": doc.metadata.get("title", ""),
+                "policy_id": doc.metadata.get("policy_id", ""),
+                "agency": doc.metadata.get("agency", ""),
+                "page_url": doc.metadata.get("page_url", ""),
+                "application_site": doc.metadata.get("application_site", ""),
+                "relevance_score": float(1 - distance)
+            }
+            for doc, distance in docs_with_scores
+        ]
+        yield f"data: {orjson.dumps({'sources': sources}).decode()}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/policy/{policy_id}")
 async def get_policy_detail(policy_id: str):
     """
@@ -317,21 +501,25 @@ async def get_policy_detail(policy_id: str):
     Returns:
         정책 상세 정보
     """
-    try:
-        # JSON 파일에서 정책 정보 로드
-        policy_file = f"data/processed/{policy_id}.json"
-        if not os.path.exists(policy_file):
-            raise HTTPException(status_code=404, detail="정책을 찾을 수 없습니다")
-        
-        with open(policy_file, 'r', encoding='utf-8') as f:
-            policy_data = json.load(f)
-        
-        return policy_data
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"정책 정보 로드 중 오류 발생: {str(e)}")
+    # 벡터스토어에 정책 ID로 인덱싱되어 있으면 O(1) SQLite 조회로 반환
+    if collection is not None:
+        try:
+            res = collection.get(
+                ids=[policy_id], include=["metadatas", "documents"]
+            )
+            if res["ids"]:
+                policy_data = dict(res["metadatas"][0])
+                policy_data["content"] = res["documents"][0]
+                return policy_data
+        except Exception as e:
+            print(f"벡터스토어 정책 조회 실패: {e}")
+
+    # 벡터스토어에 없으면 시작 시 구축한 인메모리 인덱스에서 조회
+    policy_data = policy_index.get(policy_id)
+    if policy_data is None:
+        raise HTTPException(status_code=404, detail="정책을 찾을 수 없습니다")
+
+    return policy_data
 
 def get_policy_ids_selenium(category_code, page=1):
     # ... (기존 함수에서 BASE_LIST_URL, PARAMS, url 부분만 아래처럼 수정) ...
@@ -4,27 +4,34 @@ ChromaDB 벡터 저장소 구축 스크립트
 수집된 정책 데이터를 임베딩하여 ChromaDB 벡터 저장소를 생성
 """
 
-import json
+import orjson
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Any
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
 from datetime import datetime
+from tqdm import tqdm
+
+try:
+    from rag.encoder import get_encoder, DEFAULT_MODEL_NAME
+except ImportError:
+    from encoder import get_encoder, DEFAULT_MODEL_NAME
 
 class PolicyVectorStore:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
         """
         정책 벡터 저장소 초기화
-        
+
         Args:
             model_name: 사용할 임베딩 모델명
         """
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
-        
+        # 공유 팩토리 사용: 같은 프로세스의 다른 컴포넌트와 모델 인스턴스 공유
+        self.model = get_encoder(model_name)
+
         # ChromaDB 클라이언트 초기화
         self.chroma_client = chromadb.PersistentClient(
             path="./chroma_db",
@@ -41,35 +48,54 @@ class PolicyVectorStore:
             pass
         
         # 새 컬렉션 생성
+        # 임베딩을 정규화해서 저장하므로 inner product 공간 사용 (코사인과 동일, sqrt 없이 dot 한 번)
+        # 소규모 코퍼스 기준으로 HNSW 파라미터를 튜닝: 빌드는 조금 느려지지만
+        # 쿼리 recall/latency가 기본값(M=16, ef=100)보다 좋아짐
         self.collection = self.chroma_client.create_collection(
             name=self.collection_name,
-            metadata={"description": "서울시 청년 정책 데이터베이스"}
+            metadata={
+                "hnsw:space": "ip",
+                "hnsw:M": 32,
+                "hnsw:construction_ef": 200,
+                "hnsw:search_ef": 64,
+                "description": "서울시 청년 정책 데이터베이스"
+            }
         )
         
         print(f"ChromaDB 컬렉션 '{self.collection_name}'이 생성되었습니다.")
         
-    def load_policies(self, data_dir: str = "../data/processed"):
-        """정책 데이터를 로드합니다."""
+    def _load_policy_file(self, filepath: str):
+        """정책 JSON 파일 하나를 읽어 파싱합니다."""
+        with open(filepath, 'rb') as f:
+            return orjson.loads(f.read())
+
+    def load_policies(self, data_dir: str = "../data/processed", max_workers: int = 16):
+        """정책 데이터를 로드합니다. (스레드 풀로 파일 I/O + 파싱 병렬화)"""
         policies = []
-        
+
         if not os.path.exists(data_dir):
             print(f"데이터 디렉토리가 존재하지 않습니다: {data_dir}")
             return policies
-            
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(data_dir, filename)
+
+        filepaths = [
+            os.path.join(data_dir, filename)
+            for filename in os.listdir(data_dir)
+            if filename.endswith('.json')
+        ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._load_policy_file, p): p for p in filepaths}
+            for future in as_completed(futures):
+                filepath = futures[future]
                 try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if isinstance(data, list):
-                            policies.extend(data)
-                        else:
-                            policies.append(data)
-                    print(f"로드된 파일: {filename}")
+                    data = future.result()
+                    if isinstance(data, list):
+                        policies.extend(data)
+                    else:
+                        policies.append(data)
                 except Exception as e:
-                    print(f"파일 로드 중 오류 발생 {filename}: {e}")
-        
+                    print(f"파일 로드 중 오류 발생 {os.path.basename(filepath)}: {e}")
+
         print(f"총 {len(policies)}개의 정책이 로드되었습니다.")
         return policies
     
@@ -96,7 +122,8 @@ class PolicyVectorStore:
             }
             
             documents.append({
-                'id': str(uuid.uuid4()),
+                # 정책 ID를 Chroma id로 사용하면 collection.get(ids=[...])로 O(1) 조회 가능
+                'id': policy.get('plcyBizId') or policy.get('policy_id') or str(uuid.uuid4()),
                 'text': doc_text,
                 'metadata': metadata
             })
@@ -108,29 +135,40 @@ class PolicyVectorStore:
         print("문서 임베딩을 시작합니다...")
         
         texts = [doc['text'] for doc in documents]
-        embeddings = self.model.encode(texts, show_progress_bar=True)
-        
+        embeddings = self.model.encode(
+            texts,
+            batch_size=128,
+            show_progress_bar=True,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+
         print(f"임베딩 완료: {embeddings.shape}")
         return embeddings.tolist()
     
-    def build_index(self, documents: List[Dict[str, Any]], embeddings: List[List[float]]):
+    def build_index(self, documents: List[Dict[str, Any]], embeddings: List[List[float]],
+                    batch_size: int = 2000):
         """ChromaDB 인덱스를 구축합니다."""
         print("ChromaDB 인덱스를 구축합니다...")
-        
+
         # 데이터 준비
         ids = [doc['id'] for doc in documents]
         texts = [doc['text'] for doc in documents]
         metadatas = [doc['metadata'] for doc in documents]
-        
+
         # ChromaDB에 데이터 추가
-        self.collection.add(
-            embeddings=embeddings,
-            documents=texts,
-            metadatas=metadatas,
-            ids=ids
-        )
-        
-        print(f"인덱스 구축 완료: {len(documents)}개의 문서가 저장되었습니다.")
+        # 한 번에 전부 넣으면 HNSW 삽입과 SQLite 트랜잭션이 비대해지므로 배치로 나눠서 추가
+        n = len(documents)
+        for start in tqdm(range(0, n, batch_size), desc="인덱스 구축"):
+            end = start + batch_size
+            self.collection.add(
+                embeddings=embeddings[start:end],
+                documents=texts[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+
+        print(f"인덱스 구축 완료: {n}개의 문서가 저장되었습니다.")
     
     def save_vectorstore_info(self, save_dir: str = "rag"):
         """벡터 저장소 정보를 저장합니다."""
@@ -145,17 +183,17 @@ class PolicyVectorStore:
         }
         
         config_path = os.path.join(save_dir, "vectorstore_config.json")
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        with open(config_path, 'wb') as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
         
         print(f"벡터 저장소 정보가 저장되었습니다: {config_path}")
     
     def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """쿼리와 유사한 정책을 검색합니다."""
         try:
-            # 쿼리 임베딩
-            query_embedding = self.model.encode([query])
-            
+            # 쿼리 임베딩 (저장된 벡터와 동일하게 정규화)
+            query_embedding = self.model.encode([query], normalize_embeddings=True)
+
             # ChromaDB 검색
             results = self.collection.query(
                 query_embeddings=query_embedding.tolist(),
@@ -173,14 +211,14 @@ class PolicyVectorStore:
                 )):
                     result = {
                         'rank': i + 1,
-                        'score': float(1 - distance),  # 거리를 유사도로 변환
+                        'score': float(1 - distance),  # ip 거리 -> 코사인 유사도
                         'metadata': metadata,
                         'content': document
                     }
                     search_results.append(result)
-            
+
             return search_results
-            
+
         except Exception as e:
             print(f"검색 중 오류 발생: {e}")
             return []
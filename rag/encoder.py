@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+임베딩 모델 공유 로더
+같은 프로세스에서 동일 모델을 중복 로드하지 않도록 lru_cache 팩토리 제공
+"""
+
+from functools import lru_cache
+
+import torch
+from sentence_transformers import SentenceTransformer
+
+# 저장/검색 양쪽이 같은 임베딩 공간을 쓰도록 모델명을 한 곳에서 관리
+# (API의 KoSimCSE와 벡터스토어의 MiniLM이 달라 검색 품질이 깨지는 문제 방지)
+DEFAULT_MODEL_NAME = "BM-K/KoSimCSE-roberta"
+
+@lru_cache(maxsize=4)
+def get_encoder(model_name: str = DEFAULT_MODEL_NAME) -> SentenceTransformer:
+    """SentenceTransformer 인스턴스를 모델명 기준으로 캐시해서 반환합니다.
+
+    모델 로드는 1~3초 + 수백MB 메모리가 들기 때문에 프로세스당 한 번만 수행합니다.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    if device == "cpu":
+        # CPU에서는 ONNX-Runtime 백엔드가 eager PyTorch 대비 쿼리당 수십 % 빠름
+        # (optimum/onnxruntime 미설치 시 PyTorch로 폴백)
+        try:
+            model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+            model.eval()
+            return model
+        except Exception as e:
+            print(f"ONNX 백엔드 로드 실패 (PyTorch로 계속): {e}")
+
+    model = SentenceTransformer(model_name, device=device)
+    model.eval()
+    if device == "cuda":
+        # fp16 추론으로 메모리 대역폭 절반 + 텐서코어 활용
+        model.half()
+
+    # transformer 본체를 torch.compile로 컴파일 (인코딩 가속, 첫 호출에 웜업 비용)
+    try:
+        model[0].auto_model = torch.compile(
+            model[0].auto_model, mode="reduce-overhead", fullgraph=False
+        )
+    except Exception as e:
+        print(f"torch.compile 적용 실패 (eager 모드로 계속): {e}")
+
+    return model
@@ -5,20 +5,81 @@ RAG 응답 생성 스크립트 (ChromaDB 기반)
 """
 
 import os
-import json
+import orjson
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
 import tiktoken
 
+try:
+    from rag.encoder import get_encoder, DEFAULT_MODEL_NAME
+except ImportError:
+    from encoder import get_encoder, DEFAULT_MODEL_NAME
+
+# numba는 선택 의존성: 있으면 MMR 내부 루프를 nopython 모드로 컴파일
+try:
+    import numba
+except ImportError:
+    numba = None
+
+def _mmr_kernel(sim_to_query: np.ndarray, sim_matrix: np.ndarray,
+                k: int, lam: float) -> np.ndarray:
+    """MMR 선택 루프 (numba가 있으면 nopython 모드로 컴파일됨)"""
+    n = sim_to_query.shape[0]
+    selected = np.empty(k, np.int32)
+    chosen = np.zeros(n, np.bool_)
+    max_sim = np.full(n, -1.0, dtype=np.float32)  # 선택된 문서들과의 최대 유사도
+
+    best = np.argmax(sim_to_query)
+    selected[0] = best
+    chosen[best] = True
+    max_sim = np.maximum(max_sim, sim_matrix[best])
+
+    for it in range(1, k):
+        best = -1
+        best_score = -1e30
+        for i in range(n):
+            if chosen[i]:
+                continue
+            score = lam * sim_to_query[i] - (1.0 - lam) * max_sim[i]
+            if score > best_score:
+                best_score = score
+                best = i
+        selected[it] = best
+        chosen[best] = True
+        max_sim = np.maximum(max_sim, sim_matrix[best])
+
+    return selected
+
+if numba is not None:
+    _mmr_kernel = numba.njit(cache=True, fastmath=True)(_mmr_kernel)
+
+def mmr_select(query_emb: np.ndarray, cand_embs: np.ndarray, k: int,
+               lambda_mult: float = 0.5) -> List[int]:
+    """MMR(Maximal Marginal Relevance)로 후보 인덱스 k개를 선택합니다.
+
+    유사도 계산은 BLAS 행렬곱으로 한 번에 수행하고, 선택 루프는
+    numba가 설치되어 있으면 컴파일된 커널로 실행됩니다.
+    """
+    n = len(cand_embs)
+    if n == 0:
+        return []
+    k = min(k, n)
+
+    cand_embs = np.ascontiguousarray(cand_embs, dtype=np.float32)
+    sim_to_query = cand_embs @ np.asarray(query_emb, dtype=np.float32)  # (n,)
+    sim_matrix = cand_embs @ cand_embs.T                                # (n, n)
+
+    return [int(i) for i in _mmr_kernel(sim_to_query, sim_matrix, k, lambda_mult)]
+
 class PolicyRAG:
     def __init__(self, 
                  vectorstore_dir: str = "rag",
                  chroma_db_path: str = "./chroma_db",
-                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 model_name: str = DEFAULT_MODEL_NAME,
                  openai_api_key: Optional[str] = None):
         """
         정책 RAG 시스템 초기화
@@ -32,8 +93,13 @@ class PolicyRAG:
         self.vectorstore_dir = vectorstore_dir
         self.chroma_db_path = chroma_db_path
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
-        
+        # 공유 팩토리 사용: 같은 프로세스의 다른 컴포넌트와 모델 인스턴스 공유
+        self.model = get_encoder(model_name)
+
+        # 동일 쿼리 반복 시 임베딩 forward pass를 생략하기 위한 인메모리 LRU 캐시
+        self._embed_query = lru_cache(maxsize=4096)(self._embed_query)
+
+
         # OpenAI 클라이언트 초기화
         if openai_api_key:
             self.openai_client = OpenAI(api_key=openai_api_key)
@@ -73,45 +139,53 @@ class PolicyRAG:
             # 설정 로드
             config_path = os.path.join(self.vectorstore_dir, "vectorstore_config.json")
             if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
+                with open(config_path, 'rb') as f:
+                    self.config = orjson.loads(f.read())
                 print("설정 로드 완료")
                 
         except Exception as e:
             print(f"벡터 저장소 로드 중 오류 발생: {e}")
     
+    def _embed_query(self, query: str) -> List[List[float]]:
+        """쿼리를 임베딩합니다. (__init__에서 lru_cache로 감싸 반복 질의를 캐싱)
+
+        인덱스가 정규화된 벡터 + inner product 공간으로 구축되므로 쿼리도 정규화합니다.
+        """
+        return self.model.encode([query], normalize_embeddings=True).tolist()
+
     def search_policies(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """쿼리와 유사한 정책을 검색합니다."""
         if self.collection is None:
             raise ValueError("ChromaDB 컬렉션이 로드되지 않았습니다.")
-        
+
         try:
-            # 쿼리 임베딩
-            query_embedding = self.model.encode([query])
-            
-            # ChromaDB 검색
+            # 쿼리 임베딩 (정규화된 쿼리 문자열 기준으로 캐시)
+            query_embedding = self._embed_query(query.strip())
+
+            # 후보를 넉넉히 가져온 뒤 MMR로 중복이 적은 top-k를 재선정
+            fetch_k = max(k * 4, k)
             results = self.collection.query(
-                query_embeddings=query_embedding.tolist(),
-                n_results=k
+                query_embeddings=query_embedding,
+                n_results=fetch_k,
+                include=["embeddings", "metadatas", "documents", "distances"]
             )
-            
+
             # 결과 변환
             search_results = []
             if results['ids'] and results['ids'][0]:
-                for i, (doc_id, distance, metadata, document) in enumerate(zip(
-                    results['ids'][0], 
-                    results['distances'][0], 
-                    results['metadatas'][0], 
-                    results['documents'][0]
-                )):
+                query_emb = np.asarray(query_embedding[0], dtype=np.float32)
+                cand_embs = np.asarray(results['embeddings'][0], dtype=np.float32)
+                order = mmr_select(query_emb, cand_embs, k)
+
+                for rank, idx in enumerate(order, 1):
                     result = {
-                        'rank': i + 1,
-                        'score': float(1 - distance),  # 거리를 유사도로 변환
-                        'metadata': metadata,
-                        'content': document
+                        'rank': rank,
+                        'score': float(1 - results['distances'][0][idx]),  # 거리를 유사도로 변환
+                        'metadata': results['metadatas'][0][idx],
+                        'content': results['documents'][0][idx]
                     }
                     search_results.append(result)
-            
+
             return search_results
             
         except Exception as e:
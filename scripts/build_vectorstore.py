@@ -1,22 +1,115 @@
-import json
+import hashlib
 import os
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
-from langchain_community.vectorstores import Chroma
-from langchain.schema import Document
-from langchain.embeddings import HuggingFaceEmbeddings
+import sqlite3
+import sys
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import orjson
+import torch
+import chromadb
+from chromadb.config import Settings
 import glob
 
+# 프로젝트 루트를 Python 경로에 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.encoder import get_encoder, DEFAULT_MODEL_NAME
+
+# langchain Chroma.from_documents가 쓰던 기본 컬렉션 이름과 호환 유지
+COLLECTION_NAME = "langchain"
+
+# 검색 텍스트에 넣을 (원본 키, 라벨) — create_policy_text의 분기 나열 제거
+_TEXT_FIELDS = (
+    ("title", "제목"),
+    ("introduction", "정책 소개"),
+    ("content", "지원 내용"),
+    ("policy_type", "정책 유형"),
+    ("agency", "주관 기관"),
+    ("age_range", "연령"),
+    ("education", "학력"),
+    ("employment_status", "취업상태"),
+)
+
+# 메타데이터로 저장할 (출력 키, 원본 키)
+_META_KEYS = (
+    ("policy_id", "plcyBizId"),
+    ("title", "title"),
+    ("policy_type", "policy_type"),
+    ("agency", "agency"),
+    ("age_range", "age_range"),
+    ("education", "education"),
+    ("employment_status", "employment_status"),
+    ("apply_start", "apply_start"),
+    ("apply_end", "apply_end"),
+    ("support_scale", "support_scale"),
+    ("page_url", "page_url"),
+    ("application_site", "application_site"),
+)
+
+@lru_cache(maxsize=512)
+def _encode_query_cached(model_name: str, query: str) -> np.ndarray:
+    """(모델명, 쿼리) 키로 쿼리 임베딩을 캐시
+
+    테스트 검색처럼 같은 쿼리를 반복 실행할 때 transformer forward를 건너뜁니다.
+    """
+    model = get_encoder(model_name)
+    with torch.inference_mode():
+        return model.encode([query], normalize_embeddings=True)
+
+def _load_one(filepath: str) -> Dict:
+    """정책 JSON 파일 하나를 읽어 파싱 (스레드/프로세스 풀 워커용 모듈 레벨 함수)"""
+    with open(filepath, 'rb') as f:
+        return orjson.loads(f.read())
+
+class EmbeddingCache:
+    """내용 해시를 키로 하는 영속 임베딩 캐시 (sqlite)
+
+    재빌드 시 내용이 바뀌지 않은 정책은 transformer forward를 건너뛰고
+    캐시된 벡터를 그대로 사용합니다.
+    """
+
+    def __init__(self, path: str = "embedding_cache.db"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb (hash TEXT PRIMARY KEY, model TEXT, vec BLOB)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return hashlib.sha256((model_name + "|" + text).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.conn.execute("SELECT vec FROM emb WHERE hash=?", (key,)).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def put_many(self, items):
+        """(key, model_name, vec) 목록을 한 트랜잭션으로 저장"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO emb (hash, model, vec) VALUES (?, ?, ?)",
+            [(k, m, np.asarray(v, dtype=np.float32).tobytes()) for k, m, v in items]
+        )
+        self.conn.commit()
+
 class PolicyVectorizer:
-    def __init__(self, embedding_model_name: str = "BM-K/KoSimCSE-roberta"):
+    def __init__(self, embedding_model_name: str = DEFAULT_MODEL_NAME):
         """
         정책 데이터를 벡터화하는 클래스
-        
+
         Args:
             embedding_model_name: 임베딩 모델명 (기본값: KoSimCSE)
         """
-        self.embedding_model = HuggingFaceEmbeddings(model_name=embedding_model_name)
-        self.vectorstore = None
+        # 래퍼 없이 SentenceTransformer를 직접 사용해 전체 텍스트를 한 번에 배치 인코딩
+        self.model_name = embedding_model_name
+        self.embedding_model = get_encoder(embedding_model_name)
+        self.collection = None
+        # 배치당 누적 문자 수 상한 (GPU OOM 발생 시 절반으로 줄여가며 적응)
+        self.max_chars_per_batch = 150_000
         
     def load_policy_data(self, data_dir: str = "data/processed") -> List[Dict]:
         """
@@ -30,19 +123,36 @@ class PolicyVectorizer:
         """
         policy_files = glob.glob(os.path.join(data_dir, "*.json"))
         policies = []
-        
+
+        # 스레드 풀로 파일 열기/파싱을 병렬화 (작은 JSON 수백 개의 syscall 지연을 겹침)
+        max_workers = min(32, (os.cpu_count() or 4) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_load_one, p): p for p in policy_files}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    policies.append(future.result())
+                except Exception as e:
+                    print(f"❌ 로드 실패: {file_path} - {e}")
+
+        print(f"📊 총 {len(policies)}개 정책 로드 완료")
+        return policies
+
+    def iter_policies(self, data_dir: str = "data/processed") -> Iterable[Dict]:
+        """정책 JSON을 한 건씩 흘려보내는 제너레이터
+
+        load_policy_data와 달리 전체 리스트를 메모리에 올리지 않으므로
+        코퍼스가 커져도 적재 파이프라인의 메모리 사용량은 청크 크기에 비례합니다.
+        """
+        policy_files = glob.glob(os.path.join(data_dir, "*.json"))
+        print(f"📊 총 {len(policy_files)}개 정책 파일 발견")
         for file_path in policy_files:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    policy = json.load(f)
-                    policies.append(policy)
-                print(f"✅ 로드됨: {os.path.basename(file_path)}")
+                yield _load_one(file_path)
             except Exception as e:
                 print(f"❌ 로드 실패: {file_path} - {e}")
-                
-        print(f"📊 총 {len(policies)}개 정책 로드 완료")
-        return policies
-    
+
+
     def create_policy_text(self, policy: Dict) -> str:
         """
         정책 데이터를 검색용 텍스트로 변환
@@ -53,44 +163,19 @@ class PolicyVectorizer:
         Returns:
             검색용 텍스트
         """
-        text_parts = []
-        
-        # 제목 (가장 중요)
-        if policy.get("title"):
-            text_parts.append(f"제목: {policy['title']}")
-        
-        # 정책 소개
-        if policy.get("introduction"):
-            text_parts.append(f"정책 소개: {policy['introduction']}")
-        
-        # 지원 내용
-        if policy.get("content"):
-            text_parts.append(f"지원 내용: {policy['content']}")
-        
-        # 정책 유형
-        if policy.get("policy_type"):
-            text_parts.append(f"정책 유형: {policy['policy_type']}")
-        
-        # 주관 기관
-        if policy.get("agency"):
-            text_parts.append(f"주관 기관: {policy['agency']}")
-        
-        # 신청자격 (연령, 학력 등)
-        if policy.get("age_range"):
-            text_parts.append(f"연령: {policy['age_range']}")
-        if policy.get("education"):
-            text_parts.append(f"학력: {policy['education']}")
-        if policy.get("employment_status"):
-            text_parts.append(f"취업상태: {policy['employment_status']}")
-        
-        # 신청기간
+        # 키 테이블 기반 단일 패스 (필드별 if 분기 나열 제거)
+        text_parts = [
+            f"{label}: {policy[key]}" for key, label in _TEXT_FIELDS if policy.get(key)
+        ]
+
+        # 신청기간 (두 필드 결합이라 별도 처리)
         if policy.get("apply_start") and policy.get("apply_end"):
             text_parts.append(f"신청기간: {policy['apply_start']} ~ {policy['apply_end']}")
-        
+
         # 지원규모
         if policy.get("support_scale"):
             text_parts.append(f"지원규모: {policy['support_scale']}")
-        
+
         return "\n".join(text_parts)
     
     def create_metadata(self, policy: Dict) -> Dict:
@@ -103,91 +188,182 @@ class PolicyVectorizer:
         Returns:
             메타데이터 딕셔너리
         """
-        metadata = {
-            "policy_id": policy.get("plcyBizId", ""),
-            "title": policy.get("title", ""),
-            "policy_type": policy.get("policy_type", ""),
-            "agency": policy.get("agency", ""),
-            "age_range": policy.get("age_range", ""),
-            "education": policy.get("education", ""),
-            "employment_status": policy.get("employment_status", ""),
-            "apply_start": policy.get("apply_start", ""),
-            "apply_end": policy.get("apply_end", ""),
-            "support_scale": policy.get("support_scale", ""),
-            "page_url": policy.get("page_url", ""),
-            "application_site": policy.get("application_site", "")
-        }
-        
-        # 빈 값 제거
-        metadata = {k: v for k, v in metadata.items() if v}
-        return metadata
+        # 키 테이블 기반 dict-comprehension 한 번으로 생성 (빈 값은 애초에 제외)
+        return {out: policy[src] for out, src in _META_KEYS if policy.get(src)}
     
-    def vectorize_policies(self, policies: List[Dict], persist_directory: str = "vectorstore"):
+    def _encode_smart(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """토큰 길이순으로 정렬해 배치 내 패딩 낭비를 줄이는 smart batching 인코딩
+
+        짧은 제목과 긴 지원내용이 한 배치에 섞이면 전부 최장 길이에 맞춰
+        패딩되므로, 길이가 비슷한 텍스트끼리 배치한 뒤 원래 순서로 되돌립니다.
+        """
+        tokenizer = self.embedding_model.tokenizer
+        lengths = [len(tokenizer.tokenize(t)) for t in texts]
+        order = np.argsort(lengths)
+        ordered = [texts[i] for i in order]
+
+        # inference_mode: autograd 기록/버전 카운터까지 끈 순수 추론 경로
+        # (GPU에서는 get_encoder가 fp16으로 로드해 대역폭 절반, 처리량 약 2배)
+        # 배치는 개수 + 누적 문자 수로 그리디하게 묶고, OOM이 나면
+        # 해당 배치를 단건 인코딩으로 처리한 뒤 이후 상한을 절반으로 줄임
+        parts = []
+        idx = 0
+        with torch.inference_mode():
+            while idx < len(ordered):
+                batch = [ordered[idx]]
+                chars = len(ordered[idx])
+                idx += 1
+                while (idx < len(ordered) and len(batch) < batch_size
+                       and chars + len(ordered[idx]) <= self.max_chars_per_batch):
+                    batch.append(ordered[idx])
+                    chars += len(ordered[idx])
+                    idx += 1
+
+                try:
+                    embs = self.embedding_model.encode(
+                        batch,
+                        batch_size=len(batch),
+                        convert_to_numpy=True,
+                        normalize_embeddings=True
+                    )
+                except RuntimeError as e:
+                    if "out of memory" not in str(e).lower():
+                        raise
+                    self.max_chars_per_batch = max(10_000, self.max_chars_per_batch // 2)
+                    print(f"⚠️ GPU OOM: 배치 {len(batch)}건을 단건 인코딩으로 폴백, "
+                          f"배치 상한을 {self.max_chars_per_batch}자로 축소")
+                    torch.cuda.empty_cache()
+                    embs = np.stack([
+                        self.embedding_model.encode(
+                            [t], convert_to_numpy=True, normalize_embeddings=True
+                        )[0]
+                        for t in batch
+                    ])
+                parts.append(embs)
+
+        sorted_embs = np.vstack(parts)
+
+        # 원래 입력 순서로 unscatter
+        embeddings = np.empty_like(sorted_embs)
+        embeddings[order] = sorted_embs
+        return embeddings
+
+    def vectorize_policies(self, policies: Iterable[Dict], persist_directory: str = "vectorstore",
+                           batch_size: int = 64, chunk_size: int = 256):
         """
         정책들을 벡터화하여 ChromaDB에 저장
-        
+
+        정책 이터러블을 chunk_size 단위로 잘라 텍스트 생성 → 인코딩 → 적재를
+        스트리밍으로 진행합니다. 전체 코퍼스를 메모리에 올리지 않으므로
+        메모리 사용량이 O(청크)로 유지되고, 첫 청크부터 바로 적재가 시작됩니다.
+
         Args:
-            policies: 정책 데이터 리스트
+            policies: 정책 데이터 이터러블 (리스트/제너레이터 모두 가능)
             persist_directory: 벡터스토어 저장 디렉토리
+            batch_size: 인코딩 배치 크기
+            chunk_size: 한 번에 처리할 정책 수
         """
-        documents = []
-        
-        for policy in policies:
-            # 정책 텍스트 생성
-            text = self.create_policy_text(policy)
-            if not text.strip():
-                print(f"⚠️ 텍스트가 비어있음: {policy.get('plcyBizId', 'Unknown')}")
+        chroma_client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # 일괄 적재용 HNSW 파라미터: 빌드 비용을 코퍼스 전체에 분산하고 검색 recall 확보
+        # (임베딩을 정규화해서 저장하므로 ip 공간 = 코사인)
+        self.collection = chroma_client.get_or_create_collection(
+            name=COLLECTION_NAME,
+            metadata={
+                "hnsw:space": "ip",
+                "hnsw:M": 32,
+                "hnsw:construction_ef": 200,
+                "hnsw:batch_size": 1000
+            }
+        )
+
+        # 내용 해시 기반 캐시 조회: 새로 생기거나 내용이 바뀐 정책만 인코딩
+        cache = EmbeddingCache()
+        policy_iter = iter(policies)
+        total = 0
+
+        while True:
+            chunk = list(islice(policy_iter, chunk_size))
+            if not chunk:
+                break
+
+            texts = []
+            metadatas = []
+            ids = []
+            for policy in chunk:
+                # 정책 텍스트 생성
+                text = self.create_policy_text(policy)
+                if not text.strip():
+                    print(f"⚠️ 텍스트가 비어있음: {policy.get('plcyBizId', 'Unknown')}")
+                    continue
+
+                texts.append(text)
+                metadatas.append(self.create_metadata(policy))
+                # 정책 ID를 Chroma id로 지정해 ID 기반 O(1) 조회 지원
+                ids.append(policy.get("plcyBizId") or f"policy_{total + len(ids)}")
+
+            if not texts:
                 continue
-            
-            # 메타데이터 생성
-            metadata = self.create_metadata(policy)
-            
-            # Document 객체 생성
-            doc = Document(
-                page_content=text,
-                metadata=metadata
+
+            keys = [EmbeddingCache.make_key(self.model_name, t) for t in texts]
+            cached = [cache.get(k) for k in keys]
+            miss_idx = [i for i, vec in enumerate(cached) if vec is None]
+
+            if miss_idx:
+                # 캐시 미스만 길이 정렬 배치로 인코딩한 뒤 입력 순서에 맞춰 되돌림
+                miss_embs = self._encode_smart([texts[i] for i in miss_idx], batch_size=batch_size)
+                cache.put_many(
+                    (keys[i], self.model_name, emb) for i, emb in zip(miss_idx, miss_embs)
+                )
+                for i, emb in zip(miss_idx, miss_embs):
+                    cached[i] = emb
+
+            embeddings = np.asarray(cached, dtype=np.float32)
+
+            self.collection.add(
+                ids=ids,
+                embeddings=embeddings.tolist(),
+                documents=texts,
+                metadatas=metadatas
             )
-            documents.append(doc)
-            
-            print(f"📝 벡터화 준비: {policy.get('title', 'Unknown')[:30]}...")
-        
-        print(f"🔍 총 {len(documents)}개 문서 벡터화 시작...")
-        
-        # ChromaDB에 저장
-        self.vectorstore = Chroma.from_documents(
-            documents=documents,
-            embedding=self.embedding_model,
-            persist_directory=persist_directory
-        )
-        
-        # 저장
-        self.vectorstore.persist()
-        print(f"✅ 벡터스토어 저장 완료: {persist_directory}")
-        
-        return self.vectorstore
-    
+            total += len(ids)
+            print(f"   📦 누적 {total}건 저장 (캐시 적중 {len(texts) - len(miss_idx)}/{len(texts)})")
+
+        print(f"✅ 벡터스토어 저장 완료: {persist_directory} (총 {total}건)")
+
+        return self.collection
+
     def test_search(self, query: str, k: int = 3):
         """
         검색 테스트
-        
+
         Args:
             query: 검색 쿼리
             k: 반환할 결과 수
         """
-        if not self.vectorstore:
+        if not self.collection:
             print("❌ 벡터스토어가 로드되지 않았습니다.")
             return
-        
+
         print(f"🔍 검색 쿼리: '{query}'")
-        results = self.vectorstore.similarity_search(query, k=k)
-        
-        for i, doc in enumerate(results, 1):
+        query_embedding = _encode_query_cached(self.model_name, query)
+        results = self.collection.query(
+            query_embeddings=query_embedding.tolist(),
+            n_results=k,
+            include=["metadatas", "documents"]
+        )
+
+        for i, (metadata, document) in enumerate(
+            zip(results["metadatas"][0], results["documents"][0]), 1
+        ):
             print(f"\n📋 결과 {i}:")
-            print(f"   제목: {doc.metadata.get('title', 'N/A')}")
-            print(f"   정책ID: {doc.metadata.get('policy_id', 'N/A')}")
-            print(f"   정책유형: {doc.metadata.get('policy_type', 'N/A')}")
-            print(f"   연령: {doc.metadata.get('age_range', 'N/A')}")
-            print(f"   내용 일부: {doc.page_content[:100]}...")
+            print(f"   제목: {metadata.get('title', 'N/A')}")
+            print(f"   정책ID: {metadata.get('policy_id', 'N/A')}")
+            print(f"   정책유형: {metadata.get('policy_type', 'N/A')}")
+            print(f"   연령: {metadata.get('age_range', 'N/A')}")
+            print(f"   내용 일부: {document[:100]}...")
 
 def main():
     """메인 실행 함수"""
@@ -195,17 +371,14 @@ def main():
     
     # 벡터라이저 초기화
     vectorizer = PolicyVectorizer()
-    
-    # 정책 데이터 로드
-    policies = vectorizer.load_policy_data()
-    
-    if not policies:
+
+    # 파일 → 청크 → 인코딩 → 적재를 스트리밍으로 처리 (전체 리스트 미적재)
+    vectorstore = vectorizer.vectorize_policies(vectorizer.iter_policies())
+
+    if vectorstore.count() == 0:
         print("❌ 로드할 정책 데이터가 없습니다.")
         return
-    
-    # 벡터화 및 저장
-    vectorstore = vectorizer.vectorize_policies(policies)
-    
+
     # 테스트 검색
     print("\n🧪 검색 테스트:")
     test_queries = [
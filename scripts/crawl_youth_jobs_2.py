@@ -4,11 +4,15 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import requests
-from bs4 import BeautifulSoup
-import json
+import lxml.html
+from lxml.cssselect import CSSSelector
+import orjson
+import threading
 import time
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 BASE_LIST_URL = "https://youth.seoul.go.kr/infoData/plcyInfo/list.do"
@@ -26,6 +30,25 @@ HEADERS = {
 SAVE_PATH = "data/processed"
 os.makedirs(SAVE_PATH, exist_ok=True)
 
+# keep-alive 커넥션 풀 공유 세션 (스레드마다 TCP/TLS 핸드셰이크 반복 방지)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+# 호스트 부하 제한: 전 스레드 합산 초당 최대 ~10 요청
+REQUEST_INTERVAL = 0.1
+_rate_lock = threading.Lock()
+_last_request_at = [0.0]
+
+def _throttle():
+    """고정 간격 레이트 리미터 (스레드 안전)"""
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _last_request_at[0] + REQUEST_INTERVAL - now
+        if wait > 0:
+            time.sleep(wait)
+            now = time.monotonic()
+        _last_request_at[0] = now
+
 CATEGORIES = {
     "전체": "",
     "일자리": "023010",
@@ -38,107 +61,161 @@ CATEGORIES = {
 }
 MAX_PAGES_PER_CATEGORY = 100
 
-def get_policy_ids_selenium(category_code, page=1):
-    options = webdriver.ChromeOptions()
-    # options.add_argument("--headless=new")  # 디버깅을 위해 주석 처리
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-    
-    # Windows 환경에서 ChromeDriver 경로 설정
-    chrome_driver_path = r"C:\Users\sokch\Downloads\chromedriver-win64\chromedriver-win64\chromedriver.exe"
-    service = Service(executable_path=chrome_driver_path)
-    
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-    
+# goView('ID') 추출용 정규식 (모듈 로드 시 한 번만 컴파일)
+POLICY_ID_RE = re.compile(r"goView\('([^']+)'\)")
+
+# CSS 셀렉터는 호출마다 XPath로 재컴파일되므로 모듈 로드 시 한 번만 컴파일해 재사용
+SEL_TITLE = CSSSelector(".policy-title h3")
+SEL_ROWS = CSSSelector(".table-wrap table tr")
+SEL_TH = CSSSelector("th")
+SEL_TD = CSSSelector("td")
+SEL_A = CSSSelector("a")
+
+def get_policy_ids(category_code, page=1, session=None):
+    """목록 페이지에서 정책 ID를 추출합니다.
+
+    목록은 서버 렌더링이라 onclick="goView('ID')" 마크업이 원본 HTML에 그대로
+    있으므로 Selenium 없이 HTTP GET + 정규식으로 충분합니다. (브라우저 기동 2~5초
+    + 고정 3초 대기 제거)
+    """
+    http = session or requests
     url = f"{BASE_LIST_URL}?sc_plcyFldCd={category_code}&pageIndex={page}&orderBy=regYmd+desc"
-    print(f"🔗 접속 URL: {url}")
-    driver.get(url)
-    
-    # 페이지 로딩 대기
-    wait = WebDriverWait(driver, 10)
-    try:
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".policy-list")))
-        print("✅ 페이지 로딩 완료")
-    except:
-        print("❌ 페이지 로딩 실패")
-        # HTML 저장해서 디버깅
-        with open(f"debug_page_{page}.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
-        print(f"📄 HTML 저장됨: debug_page_{page}.html")
-    
-    time.sleep(3)
-
-    # 정책 목록에서 ID 추출
-    print("🔍 정책 목록에서 ID 추출 중...")
-    
-    # 서울시 정책 목록
-    seoul_policies = driver.find_elements(By.CSS_SELECTOR, ".policy-list li a[onclick*='goView']")
-    print(f"   - 서울시 정책 수: {len(seoul_policies)}")
-    
-    ids = []
-    for policy in seoul_policies:
-        try:
-            onclick = policy.get_attribute("onclick")
-            if onclick:
-                match = re.search(r"goView\('([^']+)'\)", onclick)
-                if match:
-                    policy_id = match.group(1)
-                    ids.append(policy_id)
-                    print(f"   ✅ 서울시 정책 ID 찾음: {policy_id}")
-        except Exception as e:
-            print(f"   ❌ 정책 처리 오류: {e}")
-    
-    # 중복 제거
-    ids = list(set(ids))
-    print(f"🔹 총 고유 ID 수: {len(ids)}")
-    
-    driver.quit()
+    res = http.get(url, headers=HEADERS, timeout=10)
+
+    # 순서를 유지하면서 중복 제거
+    ids = list(dict.fromkeys(POLICY_ID_RE.findall(res.text)))
     return ids
 
+def get_policy_ids_for_category(category_code, max_pages=MAX_PAGES_PER_CATEGORY, max_workers=20):
+    """카테고리의 목록 페이지들을 동시 요청으로 수집합니다.
+
+    max_workers개 페이지씩 병렬로 가져오고, 빈 페이지가 나오면 중단합니다.
+    """
+    session = requests.Session()
+    all_ids = set()  # 처음부터 set으로 누적 (마지막 list(set(...)) 패스 불필요)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_start in range(1, max_pages + 1, max_workers):
+            pages = range(chunk_start, min(chunk_start + max_workers, max_pages + 1))
+            results = list(executor.map(
+                lambda p: get_policy_ids(category_code, p, session), pages
+            ))
+            all_ids.update(*results)
+            # 빈 페이지가 있으면 더 이상 정책이 없는 것
+            if any(not ids for ids in results):
+                break
+
+    return all_ids
+
+class PolicyListCrawler:
+    """JS 렌더링이 필요할 때 쓰는 Selenium 폴백 (기본 경로는 get_policy_ids)
+
+    드라이버를 크롤링 세션 내내 재사용해 페이지마다 브라우저 기동(~2-5초)을
+    반복하지 않습니다.
+
+    사용 예:
+        with PolicyListCrawler() as crawler:
+            for page in range(1, MAX_PAGES_PER_CATEGORY + 1):
+                ids = crawler.get_policy_ids(category_code, page)
+    """
+
+    def __enter__(self):
+        options = webdriver.ChromeOptions()
+        # options.add_argument("--headless=new")  # 디버깅을 위해 주석 처리
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+
+        # Windows 환경에서 ChromeDriver 경로 설정
+        chrome_driver_path = r"C:\Users\sokch\Downloads\chromedriver-win64\chromedriver-win64\chromedriver.exe"
+        service = Service(executable_path=chrome_driver_path)
+
+        self.driver = webdriver.Chrome(service=service, options=options)
+        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.driver.quit()
+
+    def get_policy_ids(self, category_code, page=1):
+        url = f"{BASE_LIST_URL}?sc_plcyFldCd={category_code}&pageIndex={page}&orderBy=regYmd+desc"
+        print(f"🔗 접속 URL: {url}")
+        self.driver.get(url)
+
+        # 페이지 로딩 대기: 실제 데이터(정책 링크)가 뜨는 즉시 반환 (고정 sleep 제거)
+        wait = WebDriverWait(self.driver, 10)
+        try:
+            wait.until(EC.presence_of_all_elements_located(
+                (By.CSS_SELECTOR, ".policy-list li a[onclick*='goView']")
+            ))
+            print("✅ 페이지 로딩 완료")
+        except:
+            print("❌ 페이지 로딩 실패")
+            # HTML 저장해서 디버깅
+            with open(f"debug_page_{page}.html", "w", encoding="utf-8") as f:
+                f.write(self.driver.page_source)
+            print(f"📄 HTML 저장됨: debug_page_{page}.html")
+
+        # 요소별 get_attribute IPC 왕복 대신 HTML 전체를 한 번 받아 정규식으로 일괄 추출
+        # (순서 유지 + 중복 제거)
+        ids = list(dict.fromkeys(POLICY_ID_RE.findall(self.driver.page_source)))
+        print(f"🔹 총 고유 ID 수: {len(ids)}")
+
+        return ids
+
+def _handle_period(td, value):
+    if "~" in value:
+        start, _, end = value.partition("~")
+        return {"apply_start": start.strip(), "apply_end": end.strip()}
+    return {"apply_start": value, "apply_end": ""}
+
+def _handle_file(td, value):
+    file_links = SEL_A(td)
+    if file_links and file_links[0].get("href"):
+        return {"file_url": "https://youth.seoul.go.kr" + file_links[0].get("href")}
+    return {}
+
+# 라벨 부분 문자열 -> 핸들러 디스패치 테이블 (행마다 if 체인 대신 한 번의 순회)
+DETAIL_HANDLERS = {
+    "신청기간": _handle_period,
+    "지원대상": lambda td, v: {"target": v},
+    "주관기관": lambda td, v: {"agency": v},
+    "담당기관": lambda td, v: {"agency": v},
+    "첨부": _handle_file,
+    "지원내용": lambda td, v: {"content": v},
+}
+
 def parse_detail(policy_id):
-    res = requests.get(BASE_VIEW_URL, params={"plcyBizId": policy_id}, headers=HEADERS)
-    soup = BeautifulSoup(res.text, "html.parser")
+    _throttle()
+    res = SESSION.get(BASE_VIEW_URL, params={"plcyBizId": policy_id}, headers=HEADERS)
+    # lxml 트리를 직접 쓰고 미리 컴파일한 셀렉터를 적용 (bytes를 넘겨 인코딩도 lxml이 감지)
+    tree = lxml.html.fromstring(res.content)
 
-    title = soup.select_one(".policy-title h3")
-    title = title.text.strip() if title else ""
+    title_el = SEL_TITLE(tree)
+    title = title_el[0].text_content().strip() if title_el else ""
 
-    info_table = soup.select(".table-wrap table tr")
     data = {
         "title": title,
         "plcyBizId": policy_id,
         "tags": ["일자리"],
         "page_url": f"{BASE_VIEW_URL}?plcyBizId={policy_id}"
     }
-    
-    for row in info_table:
-        th = row.select_one("th")
-        td = row.select_one("td")
+
+    for row in SEL_ROWS(tree):
+        th = SEL_TH(row)
+        td = SEL_TD(row)
         if not th or not td:
             continue
-        label = th.text.strip()
-        value = td.text.strip().replace("\xa0", " ")
-
-        if "신청기간" in label:
-            if "~" in value:
-                data["apply_start"], data["apply_end"] = [v.strip() for v in value.split("~")]
-            else:
-                data["apply_start"] = value
-                data["apply_end"] = ""
-        elif "지원대상" in label:
-            data["target"] = value
-        elif "주관기관" in label or "담당기관" in label:
-            data["agency"] = value
-        elif "첨부" in label:
-            file_link = td.select_one("a")
-            if file_link and file_link.has_attr("href"):
-                data["file_url"] = "https://youth.seoul.go.kr" + str(file_link["href"])
-        elif "지원내용" in label:
-            data["content"] = value
+        label = th[0].text_content().strip()
+        value = td[0].text_content().strip().replace("\xa0", " ")
+
+        for key, handler in DETAIL_HANDLERS.items():
+            if key in label:
+                data.update(handler(td[0], value))
+                break
 
     return data
 
@@ -147,37 +224,40 @@ def save_json(data):
     if os.path.exists(fname):
         return  # 이미 있으면 건너뜀
     try:
-        with open(fname, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # orjson은 UTF-8 bytes를 바로 생성하므로 바이너리 모드로 기록
+        with open(fname, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
         print(f"✅ 저장 완료: {fname}")
     except Exception as e:
         print(f"❌ 저장 실패: {fname}, 에러: {e}")
 
 def save_id_list(id_list, cat_name):
-    with open(f"policy_ids_{cat_name}.json", "w", encoding="utf-8") as f:
-        json.dump(list(id_list), f, ensure_ascii=False, indent=2)
+    with open(f"policy_ids_{cat_name}.json", "wb") as f:
+        f.write(orjson.dumps(list(id_list), option=orjson.OPT_INDENT_2))
 
 if __name__ == "__main__":
+    # 이미 저장된 정책은 HTTP GET/파싱 자체를 건너뜀 (재실행 시 증분 수집)
+    existing = {f[:-len(".json")] for f in os.listdir(SAVE_PATH) if f.endswith(".json")}
+    print(f"📂 기존 저장 정책: {len(existing)}건")
+
     for cat_name, cat_code in CATEGORIES.items():
         print(f"\n=== [{cat_name}] 분야 크롤링 시작 ===")
-        all_ids = set()
-        for page in tqdm(range(1, MAX_PAGES_PER_CATEGORY + 1), desc=f"{cat_name} 페이지"):
-            ids = get_policy_ids_selenium(cat_code, page)
-            if not ids:
-                print(f"🚩 {cat_name} {page}페이지에 정책이 없습니다. 다음 카테고리로 이동.")
-                break
-            for pid in ids:
-                if pid not in all_ids:
-                    all_ids.add(pid)
-                    try:
-                        detail = parse_detail(pid)
-                        save_json(detail)
-                    except Exception as e:
-                        print(f"❌ {pid} 상세 수집 에러: {e}")
-            # 100건마다 정책 ID 목록 저장
-            if len(all_ids) % 100 == 0:
-                save_id_list(all_ids, cat_name)
-            time.sleep(1)
-        # 카테고리 끝날 때마다 ID 목록 저장
+        # 목록 페이지는 병렬 HTTP로 한 번에 수집
+        all_ids = get_policy_ids_for_category(cat_code)
         save_id_list(all_ids, cat_name)
+
+        new_ids = all_ids - existing
+        print(f"🔎 {cat_name} 정책 ID {len(all_ids)}건 수집 완료 (신규 {len(new_ids)}건)")
+
+        # 상세 페이지는 I/O 바운드이므로 세션 공유 스레드 풀로 동시 수집
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            futures = {executor.submit(parse_detail, pid): pid for pid in new_ids}
+            for future in tqdm(as_completed(futures), total=len(futures), desc=f"{cat_name} 상세"):
+                pid = futures[future]
+                try:
+                    save_json(future.result())
+                    existing.add(pid)
+                except Exception as e:
+                    print(f"❌ {pid} 상세 수집 에러: {e}")
+
         print(f"✅ {cat_name} 분야 정책 {len(all_ids)}건 저장 완료")
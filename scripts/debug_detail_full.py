@@ -20,8 +20,8 @@ with open("detail_full_debug.html", "w", encoding="utf-8") as f:
     f.write(res.text)
 print("📄 HTML 저장됨: detail_full_debug.html")
 
-# 파싱 시도
-soup = BeautifulSoup(res.text, "html.parser")
+# 파싱 시도 (lxml C 파서 사용)
+soup = BeautifulSoup(res.content, "lxml")
 
 # 모든 테이블 찾기
 all_tables = soup.find_all("table")
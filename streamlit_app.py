@@ -8,9 +8,11 @@ import streamlit as st
 import os
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Dict, Any, List
 import requests
+from requests.adapters import HTTPAdapter
 import time
 
 # 프로젝트 모듈 import를 위한 경로 추가
@@ -32,124 +34,46 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 스타일 및 폰트
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR:wght@400;700&display=swap');
-html, body, [class*="css"]  { font-family: 'Noto Sans KR', sans-serif; }
-body { background: #fff; }
-.main-header {
-    background: linear-gradient(90deg, #e3f0ff 0%, #e0fff7 100%);
-    color: #222b45;
-    padding: 2.2rem 1rem 1.2rem 1rem;
-    border-radius: 18px;
-    margin-bottom: 2rem;
-    box-shadow: 0 4px 24px rgba(30,144,255,0.06);
-    text-align: center;
-    border: 1.5px solid #e0e7ef;
-}
-.policy-card {
-    background: #fff;
-    border-radius: 16px;
-    box-shadow: 0 2px 12px rgba(30,144,255,0.07);
-    padding: 1.5rem 1.2rem;
-    margin-bottom: 1.5rem;
-    border: 1.5px solid #e0e7ef;
-}
-.policy-title {
-    color: #1e90ff;
-    font-size: 1.18rem;
-    font-weight: 700;
-    margin-bottom: 0.5rem;
-    display: flex;
-    align-items: center;
-}
-.policy-title .icon {
-    font-size: 1.3rem;
-    margin-right: 0.5rem;
-}
-.policy-label {
-    display: inline-block;
-    background: #eaf6ff;
-    color: #1e90ff;
-    border-radius: 6px;
-    padding: 0.2rem 0.7rem;
-    font-size: 0.97rem;
-    margin-right: 0.5rem;
-    margin-bottom: 0.2rem;
-    font-weight: 500;
-}
-.policy-content {
-    margin-top: 0.7rem;
-    font-size: 1.05rem;
-    color: #222b45;
-}
-.stButton > button {
-    background: linear-gradient(90deg, #1e90ff 0%, #00c3a5 100%);
-    color: #fff;
-    border: none;
-    border-radius: 25px;
-    padding: 0.7rem 2.2rem;
-    font-weight: bold;
-    font-size: 1.1rem;
-    margin-top: 0.5rem;
-}
-.stButton > button:hover {
-    background: linear-gradient(90deg, #187bcd 0%, #009e82 100%);
-}
-.answer-box {
-    background: #f4faff;
-    border-left: 5px solid #1e90ff;
-    border-radius: 12px;
-    padding: 1.5rem 1.2rem;
-    margin: 1.5rem 0;
-    color: #222b45;
-}
-.source-item {
-    background: #f0f8ff;
-    border-radius: 7px;
-    padding: 0.7rem 1rem;
-    margin: 0.5rem 0;
-    font-size: 0.97rem;
-    color: #1e90ff;
-}
-.sidebar .sidebar-content {
-    background: #f8fafc;
-    color: #222b45;
-}
-</style>
-""", unsafe_allow_html=True)
+# 스타일 및 폰트 (static/style.css를 한 번만 읽어 주입 — 리런마다 긴 문자열 재생성 방지)
+@st.cache_data
+def _load_css() -> str:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "style.css"), encoding="utf-8") as f:
+        return f.read()
+
+st.markdown(f"<style>{_load_css()}</style>", unsafe_allow_html=True)
 
 # 세션 상태 초기화
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
-if 'rag_system' not in st.session_state:
-    st.session_state.rag_system = None
-
-if 'web_search_system' not in st.session_state:
-    st.session_state.web_search_system = None
-
 # API 설정
 API_BASE_URL = "http://localhost:8000"
 
+# 로컬 API용 keep-alive 세션 (질문마다 TCP 핸드셰이크 반복 방지)
+API_SESSION = requests.Session()
+API_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+@st.cache_resource(show_spinner="정책 RAG 시스템을 로드하는 중...")
+def get_rag(chroma_db_path: str = "./chroma_db"):
+    """프로세스 내 모든 세션이 공유하는 PolicyRAG 인스턴스
+
+    session_state는 브라우저 세션마다 ChromaDB/임베딩 모델을 다시 로드하지만,
+    cache_resource는 프로세스당 한 번만 로드해 모든 사용자가 공유합니다.
+    """
+    return PolicyRAG(chroma_db_path=chroma_db_path)
+
+@st.cache_resource(show_spinner="웹 검색 시스템을 로드하는 중...")
+def get_web_search():
+    """프로세스 내 모든 세션이 공유하는 WebSearchRAG 인스턴스"""
+    return WebSearchRAG()
+
 def initialize_systems():
     """RAG 시스템들을 초기화합니다."""
     try:
-        # 정책 RAG 시스템 초기화 (ChromaDB 사용)
-        if st.session_state.rag_system is None:
-            with st.spinner("정책 RAG 시스템을 로드하는 중..."):
-                st.session_state.rag_system = PolicyRAG(
-                    chroma_db_path="./chroma_db"
-                )
-        
-        # 웹 검색 RAG 시스템 초기화
-        if st.session_state.web_search_system is None:
-            with st.spinner("웹 검색 시스템을 로드하는 중..."):
-                st.session_state.web_search_system = WebSearchRAG()
-                
+        get_rag()
+        get_web_search()
         return True
-        
+
     except Exception as e:
         st.error(f"시스템 초기화 중 오류 발생: {e}")
         return False
@@ -175,46 +99,69 @@ def display_chat_message(message: Dict[str, Any], is_user: bool = False):
                             st.write(f"**{i}. {result['title']}**")
                             st.write(f"출처: {result['source']}")
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def _rag_query(query: str) -> Dict[str, Any]:
+    """같은 질문 반복 시 임베딩 검색 + GPT 호출을 건너뛰는 응답 캐시 (1시간 TTL)
+
+    해시 키는 쿼리 문자열뿐이고, RAG 객체는 cache_resource 게터로 함수
+    안에서 가져오므로 캐시 키에 포함되지 않습니다.
+    """
+    return get_rag().query(query, use_openai=True)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _web_query(query: str) -> Dict[str, Any]:
+    """웹 검색 응답 캐시 (1시간 TTL)"""
+    return get_web_search().query(query, use_gpt=True)
+
 def process_query(query: str, use_rag: bool = True, use_web_search: bool = False):
-    """질의를 처리하고 응답을 생성합니다."""
+    """질의를 처리하고 응답을 생성합니다.
+
+    RAG와 웹 검색이 둘 다 켜져 있으면 스레드 풀로 동시에 실행해
+    전체 대기 시간이 두 지연의 합이 아니라 max가 되도록 합니다.
+    (ChromaDB 읽기와 OpenAI SDK는 스레드 안전)
+    """
+    results = {}
+
+    with st.spinner("정책 데이터베이스와 웹에서 검색 중..."):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            tasks = {}
+            if use_rag:
+                tasks[executor.submit(_rag_query, query)] = '정책 RAG (ChromaDB)'
+            if use_web_search:
+                tasks[executor.submit(_web_query, query)] = '웹 검색'
+
+            for future in as_completed(tasks):
+                label = tasks[future]
+                try:
+                    results[label] = future.result()
+                except Exception as e:
+                    st.error(f"{label} 처리 중 오류: {e}")
+
     responses = []
-    
-    # 정책 RAG 응답
-    if use_rag and st.session_state.rag_system:
-        try:
-            with st.spinner("정책 데이터베이스에서 검색 중..."):
-                rag_result = st.session_state.rag_system.query(query, use_openai=True)
-            
-            responses.append({
-                'type': '정책 RAG (ChromaDB)',
-                'content': rag_result['answer'],
-                'search_results': rag_result.get('search_results', []),
-                'used_openai': rag_result.get('used_openai', False)
-            })
-        except Exception as e:
-            st.error(f"정책 RAG 처리 중 오류: {e}")
-    
-    # 웹 검색 응답
-    if use_web_search and st.session_state.web_search_system:
-        try:
-            with st.spinner("웹에서 최신 정보 검색 중..."):
-                web_result = st.session_state.web_search_system.query(query, use_gpt=True)
-            
-            responses.append({
-                'type': '웹 검색',
-                'content': web_result['answer'],
-                'search_results': web_result.get('search_results', []),
-                'used_openai': web_result.get('used_gpt', False)
-            })
-        except Exception as e:
-            st.error(f"웹 검색 처리 중 오류: {e}")
-    
+    if '정책 RAG (ChromaDB)' in results:
+        rag_result = results['정책 RAG (ChromaDB)']
+        responses.append({
+            'type': '정책 RAG (ChromaDB)',
+            'content': rag_result['answer'],
+            'search_results': rag_result.get('search_results', []),
+            'used_openai': rag_result.get('used_openai', False)
+        })
+    if '웹 검색' in results:
+        web_result = results['웹 검색']
+        responses.append({
+            'type': '웹 검색',
+            'content': web_result['answer'],
+            'search_results': web_result.get('search_results', []),
+            'used_openai': web_result.get('used_gpt', False)
+        })
+
     return responses
 
+@st.cache_data(ttl=10, show_spinner=False)
 def check_api_health() -> bool:
-    """API 서버 상태 확인"""
+    """API 서버 상태 확인 (10초 TTL 캐시 — 리런마다 동기 GET 반복 방지)"""
     try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=5)
+        response = API_SESSION.get(f"{API_BASE_URL}/health", timeout=5)
         return response.status_code == 200
     except:
         return False
@@ -222,9 +169,10 @@ def check_api_health() -> bool:
 def search_policies(query: str, k: int = 5) -> Dict[str, Any]:
     """정책 검색"""
     try:
-        response = requests.post(
+        response = API_SESSION.post(
             f"{API_BASE_URL}/search",
-            json={"query": query, "k": k}
+            json={"query": query, "k": k},
+            timeout=(2, 30)
         )
         return response.json()
     except Exception as e:
@@ -234,17 +182,19 @@ def search_policies(query: str, k: int = 5) -> Dict[str, Any]:
 def generate_answer(query: str, k: int = 3) -> Dict[str, Any]:
     """AI 답변 생성"""
     try:
-        response = requests.post(
+        response = API_SESSION.post(
             f"{API_BASE_URL}/answer",
-            json={"query": query, "k": k}
+            json={"query": query, "k": k},
+            timeout=(2, 30)
         )
         return response.json()
     except Exception as e:
         st.error(f"답변 생성 중 오류 발생: {e}")
         return {"answer": "죄송합니다. 답변을 생성할 수 없습니다.", "sources": []}
 
-def display_policy_card(policy, index):
-    st.markdown(f"""
+def render_policy_card_html(policy, index) -> str:
+    """정책 카드 HTML 문자열 생성 (카드당 st.markdown 호출 대신 일괄 렌더용)"""
+    return f"""
     <div class="policy-card">
         <div class="policy-title"><span class="icon">📄</span>{index}. {policy.get('title', '제목 없음')}</div>
         <div>
@@ -261,7 +211,7 @@ def display_policy_card(policy, index):
             <a href="{policy.get('application_site', '')}" target="_blank" style="color:#00c3a5; font-weight:600;">{policy.get('application_site', '정보 없음')}</a>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """
 
 def main():
     """메인 앱 함수"""
@@ -331,8 +281,12 @@ def main():
                 if results.get("total_count", 0) > 0:
                     st.success(f"{results['total_count']}개의 관련 정책을 찾았습니다!")
                     st.markdown("#### 정책 결과")
-                    for i, policy in enumerate(results["results"], 1):
-                        display_policy_card(policy, i)
+                    # 카드들을 HTML 하나로 합쳐 한 번만 전송 (카드당 메시지 왕복 제거)
+                    cards_html = "".join(
+                        render_policy_card_html(policy, i)
+                        for i, policy in enumerate(results["results"], 1)
+                    )
+                    st.markdown(cards_html, unsafe_allow_html=True)
                 else:
                     st.warning("관련 정책을 찾을 수 없습니다. 다른 키워드로 검색해보세요.")
             
@@ -349,8 +303,11 @@ def main():
                 sources = answer_result.get("sources", [])
                 if sources:
                     st.markdown("#### 관련 정책")
-                    for i, source in enumerate(sources, 1):
-                        display_policy_card(source, i)
+                    cards_html = "".join(
+                        render_policy_card_html(source, i)
+                        for i, source in enumerate(sources, 1)
+                    )
+                    st.markdown(cards_html, unsafe_allow_html=True)
     
     # 하단 정보
     st.markdown("---")
@@ -3,91 +3,572 @@
 DuckDuckGo 기반 검색 응답 스크립트
 웹 검색을 통해 최신 정보를 수집하고 GPT로 요약 생성
 """
+# NOTE: 이 파일의 문자열 처리 함수(create_search_context,
+# create_simple_summary 등)에 @numba.jit를 붙이지 마세요. 문자열 코드는
+# object 모드로 떨어져 순수 파이썬보다 ~30% 느려집니다
+# (numba/numba#2585 참고). 최적화는 asyncio / orjson / 캐싱 쪽으로.
 
 import os
+import io
 import json
-from typing import List, Dict, Any, Optional
-from duckduckgo_search import DDGS
-from openai import OpenAI
+import asyncio
+import hashlib
+import random
+import re
+import sqlite3
+from collections import OrderedDict
+from itertools import chain
+from typing import AsyncIterator, List, Dict, Any, Iterator, NamedTuple, Optional
+from urllib.parse import urlparse
+import httpx
+import numpy as np
+from duckduckgo_search import DDGS, AsyncDDGS
+
+try:
+    from duckduckgo_search.exceptions import DuckDuckGoSearchException
+except ImportError:
+    DuckDuckGoSearchException = Exception
+from openai import OpenAI, AsyncOpenAI
 import time
 
+try:
+    import orjson  # Rust 구현 — 한국어 UTF-8 payload에서 stdlib json보다 수 배 빠름
+except ImportError:
+    orjson = None
+
+try:
+    import hnswlib  # HNSW ANN 인덱스 — 없으면 O(N) 행렬 스캔으로 폴백
+except ImportError:
+    hnswlib = None
+
+def _dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def _loads(s):
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+def _truncate_for_tokens(s: str, max_tokens: int = 80) -> str:
+    """토큰 수 기준 근사 절단 (UTF-8 바이트 // 3 프록시)
+
+    한국어는 글자당 UTF-8 3바이트라 코드포인트 기준 [:N] 절단은 같은 N이라도
+    영문 대비 토큰이 3배로 불어 프롬프트 길이가 들쭉날쭉해집니다. 바이트
+    기준으로 자르고 경계에서 잘린 문자는 decode(ignore)로 버립니다.
+    """
+    b = s.encode('utf-8')
+    limit = max_tokens * 3
+    return s if len(b) <= limit else b[:limit].decode('utf-8', 'ignore')
+
+# GPT 프롬프트의 정적 부분 — 호출마다 바이트 단위로 동일한 prefix여야
+# OpenAI 서버측 프롬프트 캐시가 적중하므로 모듈 상수로 고정
+_SYSTEM_MSG = """당신은 서울시 청년 정책 전문가입니다.
+사용자의 질문과 관련된 최신 웹 검색 결과가 주어집니다.
+검색 결과를 바탕으로 사용자의 질문에 대한 최신 정보를 포함한 답변을 생성해주세요.
+답변은 다음을 포함해야 합니다:
+1. 질문에 대한 직접적인 답변
+2. 최신 정책 정보나 동향
+3. 관련 웹사이트나 출처 정보
+4. 추가 확인이 필요한 사항
+
+답변은 한국어로 작성하고, 친절하고 정확하게 작성해주세요."""
+
+_USER_TEMPLATE = "사용자 질문: {query}\n\n웹 검색 결과:\n{context}"
+
+# 검색 이력 추가 전용 JSONL 로그 (질의당 파일 생성 대신 한 파일에 append)
+HISTORY_PATH = os.path.join("data", "processed", "web_search_history.jsonl")
+
+# 빈 검색 결과/실패 응답의 네거티브 캐시 설정
+_NEG_CACHE_TTL = 60
+_NEG_CACHE_MAX = 256
+
+# 정형화된 FAQ 카테고리 패턴 — 매칭되면 GPT 왕복 없이 템플릿 요약으로 즉답
+_FAQ_RE = re.compile(r'(일자리|주거|창업)\s*지원')
+
+class SearchHit(NamedTuple):
+    """검색 결과 한 건 (dict 대비 메모리 절반, 속성 접근이 키 해싱보다 빠름)"""
+    title: str
+    link: str
+    snippet: str
+    source: str
+
+class LLMCache:
+    """질문 임베딩 기반 시맨틱 응답 캐시 (SHA-256 정확 일치 + 코사인 유사도 조회)
+
+    같은 질문은 해시로, "2024 서울 청년 일자리" vs "서울시 청년 일자리 2024"처럼
+    표현만 다른 질문은 임베딩 코사인 유사도(기본 0.92 이상)로 잡아
+    DDG 검색과 GPT 호출을 모두 건너뜁니다. sqlite에 영속 저장하고,
+    시맨틱 스캔용 임베딩 행렬은 메모리에 올려 둡니다.
+    """
+
+    def __init__(self, path: str = "web_search_cache.db", ttl_seconds: int = 3600,
+                 similarity_threshold: float = 0.92):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, emb BLOB, result TEXT, created REAL, mode TEXT)"
+        )
+        try:
+            # 구버전 DB 마이그레이션 — mode 컬럼이 없으면 추가
+            self.conn.execute("ALTER TABLE cache ADD COLUMN mode TEXT")
+        except sqlite3.OperationalError:
+            pass  # 이미 있는 컬럼
+        self.conn.commit()
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"hits": 0, "misses": 0}
+
+        # (key, 응답 모드, 정규화된 임베딩) 인메모리 행렬 — O(N) 코사인 스캔용
+        self._keys: List[str] = []
+        self._modes: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._load_embeddings()
+
+        # 엔트리가 수천 건을 넘으면 O(N·d) 스캔이 병목이라 HNSW 인덱스로
+        # O(log N) 근사 최근접 조회. sqlite가 원본이므로 파일 영속화 대신
+        # 시작 시 행렬에서 재구축합니다 (1만 건 미만이면 수십 ms).
+        self._hnsw = None
+        if hnswlib is not None:
+            self._hnsw = hnswlib.Index(space='cosine', dim=1536)
+            self._hnsw.init_index(max_elements=10000, ef_construction=200, M=16)
+            if self._matrix is not None:
+                self._hnsw.add_items(self._matrix, np.arange(len(self._keys)))
+
+    def _load_embeddings(self):
+        rows = self.conn.execute(
+            "SELECT key, emb, mode FROM cache WHERE emb IS NOT NULL AND created > ?",
+            (time.time() - self.ttl_seconds,)
+        ).fetchall()
+        if rows:
+            self._keys = [r[0] for r in rows]
+            # 구버전 행은 mode가 NULL — 어떤 모드와도 시맨틱 매칭되지 않음
+            self._modes = [r[2] or "" for r in rows]
+            self._matrix = np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+
+    @staticmethod
+    def cache_key(model: str, question: str) -> str:
+        # 키 직렬화는 stdlib json 고정 — orjson 유무와 무관하게 해시가 동일해야 함
+        return hashlib.sha256(
+            json.dumps([model, question], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    def _get_by_key(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT result, created FROM cache WHERE key=?", (key,)
+        ).fetchone()
+        if row and time.time() - row[1] < self.ttl_seconds:
+            return _loads(row[0])
+        return None
+
+    def get_exact(self, key: str) -> Optional[Dict[str, Any]]:
+        """정확 일치만 조회 — 임베딩 없이 호출할 수 있는 선행 검사용
+
+        적중 시에만 통계를 올립니다. 미스는 이어지는 get() 전체 조회에서
+        집계되므로 여기서는 세지 않습니다.
+        """
+        result = self._get_by_key(key)
+        if result is not None:
+            self.stats["hits"] += 1
+        return result
+
+    def get(self, key: str, emb: Optional[np.ndarray] = None,
+            mode: str = "") -> Optional[Dict[str, Any]]:
+        # 1) 정확 일치
+        result = self._get_by_key(key)
+        # 2) 시맨틱 유사도 (임베딩이 있을 때만) — HNSW 우선, 없으면 행렬 스캔
+        # 같은 mode로 저장된 엔트리만 후보로 인정 (GPT 답변/템플릿 요약 혼입 방지)
+        if result is None and emb is not None:
+            best = -1
+            if self._hnsw is not None and self._hnsw.get_current_count() > 0:
+                # 근접 후보 몇 개를 받아 기준 미달 전까지 mode가 맞는 것을 찾음
+                k = min(8, self._hnsw.get_current_count())
+                labels, dists = self._hnsw.knn_query(emb, k=k)
+                for lbl, dist in zip(labels[0], dists[0]):
+                    if 1 - dist < self.similarity_threshold:
+                        break  # 거리순이므로 이후 후보도 전부 기준 미달
+                    if self._modes[int(lbl)] == mode:
+                        best = int(lbl)
+                        break
+            elif self._matrix is not None:
+                sims = self._matrix @ emb
+                mask = np.fromiter((m == mode for m in self._modes),
+                                   dtype=bool, count=len(self._modes))
+                if mask.any():
+                    sims = np.where(mask, sims, -1.0)
+                    cand = int(np.argmax(sims))
+                    if sims[cand] >= self.similarity_threshold:
+                        best = cand
+            if best >= 0:
+                result = self._get_by_key(self._keys[best])
+        if result is not None:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+        return result
+
+    def set(self, key: str, emb: Optional[np.ndarray], result: Dict[str, Any],
+            mode: str = ""):
+        emb_blob = np.asarray(emb, dtype=np.float32).tobytes() if emb is not None else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (key, emb, result, created, mode) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, emb_blob, _dumps(result), time.time(), mode)
+        )
+        self.conn.commit()
+        if emb is not None:
+            vec = np.asarray(emb, dtype=np.float32)
+            self._keys.append(key)
+            self._modes.append(mode)
+            self._matrix = vec[None, :] if self._matrix is None else np.vstack([self._matrix, vec])
+            if self._hnsw is not None:
+                if self._hnsw.get_current_count() >= self._hnsw.get_max_elements():
+                    self._hnsw.resize_index(self._hnsw.get_max_elements() * 2)
+                self._hnsw.add_items(vec[None, :], [len(self._keys) - 1])
+
 class WebSearchRAG:
-    def __init__(self, openai_api_key: Optional[str] = None):
+    def __init__(self, openai_api_key: Optional[str] = None, proxies=None,
+                 query_suffix: str = " 서울 청년 정책"):
         """
         웹 검색 RAG 시스템 초기화
-        
+
         Args:
             openai_api_key: OpenAI API 키
+            proxies: DDG 요청에 사용할 프록시 (레이트 리밋 회피용, 선택)
+            query_suffix: 검색어에 덧붙일 맥락 접미사 (질문에 서울/청년/정책이
+                이미 있으면 생략 — 중복 토큰이 DDG 랭킹을 흐리는 것 방지)
         """
         self.openai_client = None
+        self.async_openai_client = None
+        self._httpx_client = None
+        self._async_httpx_client = None
         if openai_api_key:
-            self.openai_client = OpenAI(api_key=openai_api_key)
-        
-        self.ddgs = DDGS()
-        
-    def search_web(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+            # keep-alive 커넥션 풀 공유 — 호출마다 api.openai.com TLS 핸드셰이크 반복 방지
+            limits = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+            self._httpx_client = httpx.Client(http2=True, limits=limits, timeout=30)
+            self._async_httpx_client = httpx.AsyncClient(http2=True, limits=limits, timeout=30)
+            self.openai_client = OpenAI(api_key=openai_api_key, http_client=self._httpx_client)
+            self.async_openai_client = AsyncOpenAI(
+                api_key=openai_api_key, http_client=self._async_httpx_client
+            )
+
+        # DDG 클라이언트도 인스턴스 수명 동안 재사용
+        self.ddgs = DDGS(proxies=proxies, timeout=10)
+        self._query_suffix = query_suffix
+        self._history_fp = None
+        self.cache = LLMCache()
+        # 빈 결과용 네거티브 캐시 (짧은 TTL의 LRU) — 재시도 폭주 시 GPT 호출 낭비 방지
+        self._neg_cache = OrderedDict()
+
+    def close(self):
+        """HTTP 커넥션 풀과 이력 파일 핸들 정리"""
+        if self._history_fp:
+            self._history_fp.close()
+            self._history_fp = None
+        if self._httpx_client:
+            self._httpx_client.close()
+        if self._async_httpx_client:
+            try:
+                asyncio.run(self._async_httpx_client.aclose())
+            except RuntimeError:
+                pass  # 이미 실행 중인 이벤트 루프 안이면 루프 종료 시 정리됨
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _check_negative_cache(self, question: str) -> Optional[Dict[str, Any]]:
+        """빈 결과 네거티브 캐시 조회 (TTL 내 적중 시 실패 응답 재사용)"""
+        norm_q = re.sub(r'\s+', ' ', question.strip().lower())
+        entry = self._neg_cache.get(norm_q)
+        if entry and time.time() - entry[0] < _NEG_CACHE_TTL:
+            return entry[1]
+        return None
+
+    def _store_negative(self, question: str, result: Dict[str, Any]):
+        norm_q = re.sub(r'\s+', ' ', question.strip().lower())
+        self._neg_cache[norm_q] = (time.time(), result)
+        self._neg_cache.move_to_end(norm_q)
+        while len(self._neg_cache) > _NEG_CACHE_MAX:
+            self._neg_cache.popitem(last=False)
+
+    def _empty_result(self, question: str) -> Dict[str, Any]:
+        """검색 결과가 없을 때의 응답 — GPT 호출 없이 바로 구성"""
+        return {
+            'question': question,
+            'answer': self.create_simple_summary(question, []),
+            'search_results': [],
+            'context': "",
+            'used_gpt': False,
+            'timestamp': time.time()
+        }
+
+    def _embed_question(self, question: str) -> Optional[np.ndarray]:
+        """시맨틱 캐시 조회용 질문 임베딩 (정규화, OpenAI 키 없으면 None)"""
+        if not self.openai_client:
+            return None
+        try:
+            res = self.openai_client.embeddings.create(
+                model="text-embedding-3-small",
+                input=[question]
+            )
+            vec = np.asarray(res.data[0].embedding, dtype=np.float32)
+            return vec / np.linalg.norm(vec)
+        except Exception as e:
+            print(f"질문 임베딩 생성 중 오류 발생: {e}")
+            return None
+
+    def _build_search_query(self, query: str) -> str:
+        """검색어에 맥락 접미사를 덧붙입니다 (이미 포함돼 있으면 원문 그대로)"""
+        if any(w in query for w in ("서울", "청년", "정책")):
+            return query
+        return query + self._query_suffix
+
+    def _ddg_text(self, search_query: str, max_results: int):
+        """DDG 텍스트 검색 원본 결과 (재시도 포함, 동기 경로 공용)
+
+        레이트 리밋 등 일시 오류는 지수 백오프(+지터)로 최대 3회 재시도합니다.
+        """
+        for attempt in range(3):
+            try:
+                return self.ddgs.text(
+                    search_query, max_results=max_results, backend='api'
+                )
+            except DuckDuckGoSearchException as e:
+                if attempt == 2:
+                    raise
+                wait = 2 ** attempt + random.random()
+                print(f"DDG 검색 실패, {wait:.1f}초 후 재시도: {e}")
+                time.sleep(wait)
+        return []
+
+    def search_web(self, query: str, max_results: int = 5) -> List[SearchHit]:
         """DuckDuckGo를 사용하여 웹 검색을 수행합니다."""
         try:
-            # 한국어 검색을 위해 쿼리에 "서울 청년 정책" 추가
-            search_query = f"{query} 서울 청년 정책"
-            
+            # 한국어 검색을 위해 필요할 때만 맥락 접미사 추가
+            search_query = self._build_search_query(query)
+
             results = []
-            search_results = self.ddgs.text(search_query, max_results=max_results)
-            
-            for result in search_results:
-                results.append({
-                    'title': result.get('title', ''),
-                    'link': result.get('link', ''),
-                    'snippet': result.get('body', ''),
-                    'source': result.get('link', '').split('/')[2] if result.get('link') else ''
-                })
-            
+            _urlparse = urlparse  # 루프 안 전역 조회 제거
+            for result in self._ddg_text(search_query, max_results):
+                link = result.get('link', '')
+                results.append(SearchHit(
+                    title=result.get('title', ''),
+                    link=link,
+                    snippet=result.get('body', ''),
+                    source=_urlparse(link).netloc if link else ''
+                ))
+
             return results
-            
+
         except Exception as e:
             print(f"웹 검색 중 오류 발생: {e}")
             return []
-    
-    def create_search_context(self, search_results: List[Dict[str, Any]]) -> str:
-        """검색 결과를 컨텍스트로 변환합니다."""
+
+    def _collect_and_format(self, query: str, max_results: int = 5) -> tuple:
+        """검색 결과 수집과 컨텍스트 생성을 한 루프로 융합합니다.
+
+        search_web 후 create_search_context로 같은 리스트를 다시 돌며
+        문자열을 한 벌 더 만들던 것을, 히트를 만들면서 곧바로 StringIO
+        버퍼에 컨텍스트를 써 내려가 패스와 중간 할당을 절반으로 줄입니다.
+        반환은 (hits, context) 튜플입니다.
+        """
+        hits: List[SearchHit] = []
+        buf = io.StringIO()
+        seen_hashes = set()
+        index = 0
+        try:
+            search_query = self._build_search_query(query)
+            _urlparse = urlparse  # 루프 안 전역 조회 제거
+            for result in self._ddg_text(search_query, max_results):
+                link = result.get('link', '')
+                snippet = result.get('body', '')
+                hit = SearchHit(
+                    title=result.get('title', ''),
+                    link=link,
+                    snippet=snippet,
+                    source=_urlparse(link).netloc if link else ''
+                )
+                hits.append(hit)
+
+                # create_search_context와 동일한 근사 중복 제거
+                h = hashlib.blake2b(
+                    re.sub(r'\W+', '', snippet.lower())[:200].encode('utf-8'),
+                    digest_size=8
+                ).digest()
+                if h in seen_hashes:
+                    continue
+                seen_hashes.add(h)
+
+                index += 1
+                if index > 1:
+                    buf.write("\n")
+                buf.write(f"""
+검색 결과 {index}:
+제목: {hit.title[:120]}
+출처: {hit.source}
+내용: {_truncate_for_tokens(snippet, 100)}
+""")
+        except Exception as e:
+            print(f"웹 검색 중 오류 발생: {e}")
+
+        context = buf.getvalue() if index else "관련된 웹 검색 결과가 없습니다."
+        return hits, context
+
+
+    def create_search_context(self, search_results: List[SearchHit]) -> str:
+        """검색 결과를 컨텍스트로 변환합니다.
+
+        프롬프트 토큰을 줄이기 위해 스니펫은 300자, 제목은 120자로 자르고,
+        DDG가 자주 돌려주는 중복 문단은 정규화 해시로 걸러냅니다.
+        링크는 프롬프트에서 빼고 search_results에만 남깁니다.
+        """
         if not search_results:
             return "관련된 웹 검색 결과가 없습니다."
-        
+
         context_parts = []
-        for i, result in enumerate(search_results, 1):
+        seen_hashes = set()
+        index = 0
+        for result in search_results:
+            snippet = result.snippet
+            # 정규화(소문자 + 비단어 제거) 후 앞 200자 해시로 근사 중복 제거
+            h = hashlib.blake2b(
+                re.sub(r'\W+', '', snippet.lower())[:200].encode('utf-8'),
+                digest_size=8
+            ).digest()
+            if h in seen_hashes:
+                continue
+            seen_hashes.add(h)
+
+            index += 1
             context_parts.append(f"""
-검색 결과 {i}:
-제목: {result['title']}
-출처: {result['source']}
-링크: {result['link']}
-내용: {result['snippet']}
+검색 결과 {index}:
+제목: {result.title[:120]}
+출처: {result.source}
+내용: {_truncate_for_tokens(snippet, 100)}
 """)
-        
+
         return "\n".join(context_parts)
     
-    def summarize_with_gpt(self, query: str, context: str) -> str:
-        """GPT를 사용하여 검색 결과를 요약합니다."""
+    async def search_web_async(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+        """search_web의 비동기 버전 (AsyncDDGS 사용)"""
+        try:
+            search_query = self._build_search_query(query)
+
+            search_results = []
+            async with AsyncDDGS() as ddgs:
+                for attempt in range(3):
+                    try:
+                        search_results = await ddgs.atext(
+                            search_query, max_results=max_results, backend='api'
+                        )
+                        break
+                    except DuckDuckGoSearchException as e:
+                        if attempt == 2:
+                            raise
+                        wait = 2 ** attempt + random.random()
+                        print(f"DDG 검색 실패, {wait:.1f}초 후 재시도: {e}")
+                        await asyncio.sleep(wait)
+
+            results = []
+            _urlparse = urlparse  # 루프 안 전역 조회 제거
+            for result in search_results or []:
+                link = result.get('link', '')
+                results.append(SearchHit(
+                    title=result.get('title', ''),
+                    link=link,
+                    snippet=result.get('body', ''),
+                    source=_urlparse(link).netloc if link else ''
+                ))
+
+            return results
+
+        except Exception as e:
+            print(f"웹 검색 중 오류 발생: {e}")
+            return []
+
+    def _build_summarize_prompt(self, query: str, context: str) -> str:
+        """검색 결과 요약용 user 메시지 생성 (동기/비동기 경로 공용)
+
+        지시문 전체는 _SYSTEM_MSG에 고정돼 있고, 여기서는 동적 슬롯만 채웁니다.
+        """
+        return _USER_TEMPLATE.format_map({"query": query, "context": context})
+
+    def summarize_with_gpt(self, query: str, context: str) -> Iterator[str]:
+        """GPT 요약을 스트리밍 청크로 생성합니다.
+
+        stream=True로 첫 토큰부터 바로 내보내므로 호출자가 진행 중에
+        출력할 수 있습니다. 전체 답변이 필요하면 "".join(...)으로 모읍니다.
+        """
         if not self.openai_client:
-            return "OpenAI API 키가 설정되지 않았습니다."
-        
-        prompt = f"""
-당신은 서울시 청년 정책 전문가입니다.
-다음은 사용자의 질문과 관련된 최신 웹 검색 결과입니다:
+            yield "OpenAI API 키가 설정되지 않았습니다."
+            return
 
-사용자 질문: {query}
+        prompt = self._build_summarize_prompt(query, context)
 
-웹 검색 결과:
-{context}
+        try:
+            response = self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": _SYSTEM_MSG},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=1000,
+                temperature=0.7,
+                stream=True
+            )
+            for chunk in response:
+                yield chunk.choices[0].delta.content or ""
+        except Exception as e:
+            yield f"요약 생성 중 오류가 발생했습니다: {e}"
 
-위 검색 결과를 바탕으로 사용자의 질문에 대한 최신 정보를 포함한 답변을 생성해주세요.
-답변은 다음을 포함해야 합니다:
-1. 질문에 대한 직접적인 답변
-2. 최신 정책 정보나 동향
-3. 관련 웹사이트나 출처 정보
-4. 추가 확인이 필요한 사항
+    async def summarize_with_gpt_async(self, query: str, context: str) -> AsyncIterator[str]:
+        """summarize_with_gpt의 비동기 스트리밍 버전 (AsyncOpenAI 사용)"""
+        if not self.async_openai_client:
+            yield "OpenAI API 키가 설정되지 않았습니다."
+            return
 
-답변은 한국어로 작성하고, 친절하고 정확하게 작성해주세요.
-"""
+        prompt = self._build_summarize_prompt(query, context)
+
+        try:
+            response = await self.async_openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": _SYSTEM_MSG},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=1000,
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in response:
+                yield chunk.choices[0].delta.content or ""
+        except Exception as e:
+            yield f"요약 생성 중 오류가 발생했습니다: {e}"
+
+    def summarize_batch(self, queries: List[str], contexts: List[str]) -> List[str]:
+        """여러 질문을 GPT 호출 한 번으로 요약합니다.
+
+        질문/컨텍스트를 번호 블록으로 묶은 프롬프트 하나를 보내고 JSON 배열로
+        응답받아, 요청당 TLS/큐/prefill 오버헤드를 N번에서 1번으로 줄입니다.
+        """
+        if not self.openai_client:
+            return ["OpenAI API 키가 설정되지 않았습니다."] * len(queries)
+
+        blocks = []
+        for i, (q, c) in enumerate(zip(queries, contexts), 1):
+            blocks.append(f"### Q{i}\n{q}\n### Ctx{i}\n{c}")
+
+        prompt = (
+            "아래 번호가 매겨진 각 질문(Q)과 웹 검색 컨텍스트(Ctx)에 대해 "
+            "한국어로 친절하고 정확한 답변을 생성해주세요.\n"
+            '반드시 JSON 객체 {"answers": [{"id": 1, "answer": "..."}, ...]} '
+            "형식으로만 응답하세요.\n\n"
+            + "\n\n".join(blocks)
+        )
 
         try:
             response = self.openai_client.chat.completions.create(
@@ -96,58 +577,161 @@ class WebSearchRAG:
                     {"role": "system", "content": "당신은 서울시 청년 정책 전문가입니다."},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=1000,
-                temperature=0.7
+                # gpt-3.5-turbo 완성 토큰 상한(4096) 초과 시 400이 나므로 캡
+                max_tokens=min(4096, 1000 * len(queries)),
+                temperature=0.7,
+                response_format={"type": "json_object"}
             )
-            return response.choices[0].message.content
+            payload = _loads(response.choices[0].message.content)
+            answers = {int(a["id"]): a["answer"] for a in payload.get("answers", [])}
+            return [answers.get(i, "답변을 생성하지 못했습니다.") for i in range(1, len(queries) + 1)]
         except Exception as e:
-            return f"요약 생성 중 오류가 발생했습니다: {e}"
-    
-    def create_simple_summary(self, query: str, search_results: List[Dict[str, Any]]) -> str:
+            return [f"요약 생성 중 오류가 발생했습니다: {e}"] * len(queries)
+
+    def create_simple_summary(self, query: str, search_results: List[SearchHit]) -> str:
         """간단한 요약을 생성합니다 (GPT 없이)."""
         if not search_results:
             return f"'{query}'에 대한 최신 정보를 찾을 수 없습니다."
-        
-        summary_parts = [f"'{query}'에 대한 최신 웹 검색 결과입니다:\n"]
-        
-        for i, result in enumerate(search_results, 1):
-            summary_parts.append(f"""
-{i}. {result['title']}
-   출처: {result['source']}
-   내용: {result['snippet'][:200]}...
-   링크: {result['link']}
-""")
-        
-        summary_parts.append("\n더 자세한 정보는 위 링크를 통해 확인하실 수 있습니다.")
-        
-        return "\n".join(summary_parts)
+
+        # 중간 리스트 없이 제너레이터를 "".join으로 바로 소비 — 결과당 문자열
+        # 하나씩만 생성됩니다
+        return "".join(chain(
+            (f"'{query}'에 대한 최신 웹 검색 결과입니다:\n",),
+            (f"\n{i}. {result.title}\n"
+             f"   출처: {result.source}\n"
+             f"   내용: {_truncate_for_tokens(result.snippet)}...\n"
+             f"   링크: {result.link}\n"
+             for i, result in enumerate(search_results, 1)),
+            ("\n더 자세한 정보는 위 링크를 통해 확인하실 수 있습니다.",)
+        ))
     
-    def query(self, question: str, use_gpt: bool = True, max_results: int = 5) -> Dict[str, Any]:
-        """웹 검색 기반 질의응답을 처리합니다."""
+    def query(self, question: str, use_gpt: Optional[bool] = None,
+              max_results: int = 5) -> Dict[str, Any]:
+        """웹 검색 기반 질의응답을 처리합니다.
+
+        use_gpt가 None(기본)이면 FAQ 패턴 질문은 GPT 없이 템플릿 요약으로
+        즉답하고, 나머지는 GPT를 사용합니다. True/False로 명시하면
+        패턴과 무관하게 강제합니다.
+        """
+        # 응답 모드를 먼저 확정 — FAQ 패턴 질문은 LLM 호출(5~15초) 대신
+        # 검색 결과 템플릿으로 즉답
+        if use_gpt is None:
+            use_gpt = not _FAQ_RE.search(question)
+        use_gpt = use_gpt and self.openai_client is not None
+
+        # 캐시 조회: 정확 일치 먼저 — 적중하면 임베딩 왕복까지 통째로 생략
+        # 키/시맨틱 조회 모두 응답 모드로 구분해 GPT 답변과 템플릿 요약이 섞이지 않게 함
+        mode = "gpt-3.5-turbo" if use_gpt else "simple"
+        cache_key = LLMCache.cache_key(mode, question)
+        cached = self.cache.get_exact(cache_key)
+        if cached is not None:
+            return cached
+
+        # 네거티브 캐시도 검색 전에 — 적중 시 DDG 재시도(최대 수 초)까지 생략
+        cached_fail = self._check_negative_cache(question)
+        if cached_fail is not None:
+            return cached_fail
+
+        # 정확 미스일 때만 임베딩을 만들어 시맨틱 유사도 조회
+        question_emb = self._embed_question(question)
+        cached = self.cache.get(cache_key, question_emb, mode)
+        if cached is not None:
+            return cached
+
+        try:
+            # 웹 검색 + 컨텍스트 생성을 한 패스로 수행
+            search_results, context = self._collect_and_format(question, max_results)
+
+            # 빈 결과: GPT 호출 없이 즉시 응답하고 짧은 TTL로 네거티브 캐시
+            if not search_results:
+                result = self._empty_result(question)
+                self._store_negative(question, result)
+                return result
+
+            # 응답 생성 (스트리밍 청크를 모아 완성)
+            if use_gpt:
+                answer = "".join(self.summarize_with_gpt(question, context))
+            else:
+                answer = self.create_simple_summary(question, search_results)
+
+            result = {
+                'question': question,
+                'answer': answer,
+                # 외부 계약(JSON 저장/표시)은 dict 유지 — 경계에서만 변환
+                'search_results': [hit._asdict() for hit in search_results],
+                'context': context,
+                'used_gpt': use_gpt,
+                'timestamp': time.time()
+            }
+            self.cache.set(cache_key, question_emb, result, mode)
+            return result
+
+        except Exception as e:
+            result = {
+                'question': question,
+                'answer': f"오류가 발생했습니다: {e}",
+                'search_results': [],
+                'context': "",
+                'used_gpt': False,
+                'error': str(e),
+                'timestamp': time.time()
+            }
+            # 오류 응답도 짧은 TTL로 네거티브 캐시 — 재시도 폭주 방지
+            self._store_negative(question, result)
+            return result
+
+    async def query_async(self, question: str, use_gpt: Optional[bool] = None,
+                          max_results: int = 5) -> Dict[str, Any]:
+        """query의 비동기 버전 — DDG 검색과 GPT 요약을 이벤트 루프에서 처리합니다."""
+        if use_gpt is None:
+            use_gpt = not _FAQ_RE.search(question)
+        use_gpt = use_gpt and self.async_openai_client is not None
+
+        mode = "gpt-3.5-turbo" if use_gpt else "simple"
+        cache_key = LLMCache.cache_key(mode, question)
+        cached = self.cache.get_exact(cache_key)
+        if cached is not None:
+            return cached
+
+        cached_fail = self._check_negative_cache(question)
+        if cached_fail is not None:
+            return cached_fail
+
+        question_emb = await asyncio.to_thread(self._embed_question, question)
+        cached = self.cache.get(cache_key, question_emb, mode)
+        if cached is not None:
+            return cached
+
         try:
-            # 웹 검색 수행
-            search_results = self.search_web(question, max_results)
-            
-            # 컨텍스트 생성
+            search_results = await self.search_web_async(question, max_results)
+
+            if not search_results:
+                result = self._empty_result(question)
+                self._store_negative(question, result)
+                return result
+
             context = self.create_search_context(search_results)
-            
-            # 응답 생성
-            if use_gpt and self.openai_client:
-                answer = self.summarize_with_gpt(question, context)
+
+            if use_gpt:
+                answer = "".join(
+                    [chunk async for chunk in self.summarize_with_gpt_async(question, context)]
+                )
             else:
                 answer = self.create_simple_summary(question, search_results)
-            
-            return {
+
+            result = {
                 'question': question,
                 'answer': answer,
-                'search_results': search_results,
+                'search_results': [hit._asdict() for hit in search_results],
                 'context': context,
-                'used_gpt': use_gpt and self.openai_client is not None,
+                'used_gpt': use_gpt,
                 'timestamp': time.time()
             }
-            
+            self.cache.set(cache_key, question_emb, result, mode)
+            return result
+
         except Exception as e:
-            return {
+            result = {
                 'question': question,
                 'answer': f"오류가 발생했습니다: {e}",
                 'search_results': [],
@@ -156,20 +740,20 @@ class WebSearchRAG:
                 'error': str(e),
                 'timestamp': time.time()
             }
-    
-    def save_search_history(self, query_result: Dict[str, Any], filename: str = None):
-        """검색 결과를 파일로 저장합니다."""
-        if not filename:
-            timestamp = int(query_result.get('timestamp', time.time()))
-            filename = f"web_search_{timestamp}.json"
-        
-        filepath = os.path.join("data", "processed", filename)
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(query_result, f, ensure_ascii=False, indent=2)
-        
-        print(f"검색 결과가 {filepath}에 저장되었습니다.")
+            self._store_negative(question, result)
+            return result
+
+    def save_search_history(self, query_result: Dict[str, Any]):
+        """검색 결과를 추가 전용 JSONL 로그에 기록합니다.
+
+        질의마다 새 파일을 만들지 않고 핸들 하나를 재사용해 한 줄씩 append —
+        open/stat 반복이 사라지고 indent 없는 직렬화라 인코딩도 빠릅니다.
+        """
+        if self._history_fp is None:
+            os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+            self._history_fp = open(HISTORY_PATH, "a", encoding="utf-8", buffering=1 << 16)
+
+        self._history_fp.write(_dumps(query_result) + "\n")
 
 def main():
     """메인 실행 함수"""
@@ -188,20 +772,54 @@ def main():
         "서울시 청년 창업 지원 프로그램"
     ]
     
-    for question in test_questions:
+    # 1단계: DDG 검색만 동시 실행 (DDG 레이트 리밋 고려, 동시 3개)
+    async def _fetch_all():
+        semaphore = asyncio.Semaphore(3)
+
+        async def _fetch_one(question):
+            async with semaphore:
+                return await web_rag.search_web_async(question)
+
+        return await asyncio.gather(*(_fetch_one(q) for q in test_questions))
+
+    all_search_results = asyncio.run(_fetch_all())
+    contexts = [web_rag.create_search_context(sr) for sr in all_search_results]
+
+    # 2단계: 질문 전체를 GPT 호출 한 번으로 배치 요약
+    if openai_api_key:
+        answers = web_rag.summarize_batch(test_questions, contexts)
+    else:
+        answers = [
+            web_rag.create_simple_summary(q, sr)
+            for q, sr in zip(test_questions, all_search_results)
+        ]
+
+    results = [
+        {
+            'question': question,
+            'answer': answer,
+            'search_results': [hit._asdict() for hit in search_results],
+            'context': context,
+            'used_gpt': bool(openai_api_key),
+            'timestamp': time.time()
+        }
+        for question, answer, search_results, context in zip(
+            test_questions, answers, all_search_results, contexts
+        )
+    ]
+
+    for question, result in zip(test_questions, results):
         print(f"\n{'='*60}")
         print(f"질문: {question}")
         print(f"{'='*60}")
-        
-        result = web_rag.query(question, use_gpt=bool(openai_api_key))
-        
+
         print(f"답변: {result['answer']}")
-        
+
         if result['search_results']:
             print(f"\n참고한 웹 검색 결과:")
             for i, sr in enumerate(result['search_results'][:3], 1):
                 print(f"  {i}. {sr['title']} ({sr['source']})")
-        
+
         # 검색 결과 저장
         web_rag.save_search_history(result)
 